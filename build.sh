@@ -0,0 +1,20 @@
+#!/usr/bin/env sh
+# Önálló, egyetlen futtatható állomány készítése Nuitka-val.
+# A lefordított program indulásakor nem kell a Python modulokat (tqdm, psutil, xxhash)
+# egyenként feloldani és betölteni, így a hidegindítás lényegesen gyorsabb -
+# ez akkor számít, ha a programot pl. könyvtáranként, ciklusban futtatják.
+#
+# Előfeltétel: pip install nuitka (valamint a requirements.txt csomagjai)
+# Használat:   ./build.sh   ->   build/duplicates (Windows alatt: build\duplicates.exe)
+set -e
+
+cd "$(dirname "$0")"
+
+python -m nuitka \
+    --standalone \
+    --onefile \
+    --follow-imports \
+    --assume-yes-for-downloads \
+    --output-dir=build \
+    --output-filename=duplicates \
+    duplicates.py
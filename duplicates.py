@@ -11,7 +11,7 @@
 # ==============================================================================
 #
 # Telepítés:
-# 1. Győződj meg róla, hogy a Python 3.7 vagy újabb verziója van telepítve.
+# 1. Győződj meg róla, hogy a Python 3.8 vagy újabb verziója van telepítve.
 # 2. Telepítsd a szükséges csomagokat:
 #    pip install -r requirements.txt vagy
 #    pip install psutil xxhash tqdm
@@ -56,6 +56,9 @@
 # 7. Duplikátumok törlése a fájlokból (fájlon belüli és fájlok közötti):
 #    python find_duplicates.py --deleteduplicates true
 #
+# 8. 32 bites hash-kulcsok használata kis adathalmazon (kisebb 'disk' módú ideiglenes fájlok):
+#    python find_duplicates.py --hash-bits 32
+#
 # ==============================================================================
 
 # --- Szükséges modulok importálása ---
@@ -64,19 +67,34 @@ import gc  # Garbage Collector, memóriakezeléshez
 import sys  # Rendszerspecifikus paraméterek és függvények (pl. parancssori argumentumok)
 import time  # Idővel kapcsolatos függvények (pl. futási idő mérése)
 import heapq  # Kupac (heap) algoritmusok, a 'disk' módhoz szükséges
+import math  # Egész négyzetgyök az összefésülési csoportmérethez
+import struct  # Bináris rekordok a 'disk' mód ideiglenes fájljaiban
+import io  # Pufferelt olvasó a tömörített ideiglenes fájlokhoz
 import logging  # Naplózási funkciók
 import argparse  # Parancssori argumentumok feldolgozása
+import functools  # Függvény-gyorsítótárazás (specializált normalizálók)
+import re  # Reguláris kifejezések (mezőhatár-keresés)
 import itertools  # Iterátorokat létrehozó függvények (pl. csoportosítás)
+import operator  # C-szintű kulcsfüggvények (itemgetter) rendezéshez és csoportosításhoz
 import shutil  # Fájlműveletek (másolás, mozgatás)
+import pickle  # A kimeneti bejegyzések ideiglenes futamfájljaihoz
 import tempfile  # Ideiglenes fájlok kezelése
+import fnmatch  # Fájlnév-minták illesztése (a könyvtárbejáráshoz)
+import mmap  # Memóriába képzett fájlolvasás az előolvasó szálhoz
+import queue  # Szálbiztos sor az előolvasó szálhoz
+import threading  # Háttérszál a fájlolvasás és a hash-elés átfedéséhez
+import traceback  # A worker oldali hibák szöveges tracebackje (kötegelt feladatoknál)
 from tqdm import tqdm  # Haladást jelző sáv (progress bar)
 from pathlib import Path  # Objektumorientált fájlrendszer-elérési utak
 from datetime import datetime  # Dátum és idő kezelése
 from collections import defaultdict, Counter  # Speciális konténer típusok
-from typing import Dict, Set, List, Tuple, Callable, Iterator, Any  # Típusannotációk
+from typing import Dict, Set, List, Tuple, Callable, Iterable, Iterator, Any, AnyStr  # Típusannotációk
 
 # Párhuzamos végrehajtáshoz szükséges modulok
-from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing
+from multiprocessing import shared_memory  # A törlendő hash-ek megosztása a workerekkel (Python 3.8+)
+from array import array  # Tömör, gépi egészekből álló tömb (a megosztott hash-táblához)
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 
 # --- Csomagok importálása és Hashing függvény kiválasztása ---
 # Megpróbáljuk importálni a 'psutil'-t a rendszererőforrások (pl. RAM) lekérdezéséhez
@@ -86,33 +104,92 @@ try:
 except ImportError:
     PSUTIL_AVAILABLE = False  # Jelezzük, hogy a psutil nem elérhető
 
+# Megpróbáljuk importálni a 'zstandard'-ot a 'disk' mód ideiglenes fájljainak tömörítéséhez
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True  # Az ideiglenes fájlok zstd-tömörítve kerülnek a lemezre
+except ImportError:
+    ZSTD_AVAILABLE = False  # Tömörítetlen ideiglenes fájlok
+
 # Megpróbáljuk importálni a gyors 'xxhash' könyvtárat. Ha nem sikerül, a beépített 'hashlib'-et használjuk.
 try:
     import xxhash
     HASH_ALGO_NAME = "xxhash (xxh64)"  # A használt hash algoritmus neve
-    def get_hash_function() -> Callable[[bytes], str]:
-        # Visszaad egy gyors hash-függvényt (xxh64)
-        return lambda data: xxhash.xxh64(data, seed=2024).hexdigest()
+    def get_hash_function(bits: int = 64) -> Callable[[bytes], int]:
+        # Visszaad egy gyors hash-függvényt (xxh64, vagy 32 bites kulcsokhoz xxh32).
+        # A kulcs egész szám: kisebb, mint a hex string, és a szótárban olcsóbb hash-elni.
+        # Az egylépéses *_intdigest C-függvényt partial köti a seedhez: soronként nem jön létre
+        # hasher objektum, és nincs közbülső Python (lambda) hívási szint sem.
+        if bits == 32:
+            return functools.partial(xxhash.xxh32_intdigest, seed=2024)
+        return functools.partial(xxhash.xxh64_intdigest, seed=2024)
 except ImportError:
     import hashlib
     HASH_ALGO_NAME = "hashlib (blake2b)"  # A használt hash algoritmus neve
-    def get_hash_function() -> Callable[[bytes], str]:
-        # Visszaad egy biztonságos, de lassabb hash-függvényt (blake2b)
-        return lambda data: hashlib.blake2b(data, digest_size=32).hexdigest()
+    def get_hash_function(bits: int = 64) -> Callable[[bytes], int]:
+        # Visszaad egy biztonságos, de lassabb hash-függvényt (blake2b, a kért bitszélességgel, egész kulccsal)
+        digest_size = bits // 8
+        return lambda data: int.from_bytes(hashlib.blake2b(data, digest_size=digest_size).digest(), 'little')
 
 # --- Konstansok ---
 DEFAULT_INPUT_DIR = Path("input")  # Alapértelmezett bemeneti könyvtár
 DEFAULT_OUTPUT_FILE = Path("duplicates.txt")  # Alapértelmezett kimeneti fájl
 LOG_DIR = Path("logs")  # Naplófájlok könyvtára
-TEMP_DIR = Path("temp_duplicate_finder")  # Ideiglenes fájlok könyvtára a 'disk' módhoz
-MAX_WORKERS = max(1, (os.cpu_count() or 2) - 1)  # Párhuzamos processzek maximális száma (CPU magok - 1)
-DISK_MODE_DELIMITER = "\t"  # Elválasztó karakter a 'disk' mód ideiglenes fájljaiban
+TEMP_DIR = Path("temp_duplicate_finder")  # Ideiglenes fájlok könyvtára a 'disk' és a 'safe' módhoz
+# Párhuzamos processzek maximális száma (alapértelmezés: CPU magok - 1). A DUPLICATE_FINDER_WORKERS
+# környezeti változóval egyszer, induláskor rögzíthető; a 'spawn'-nal indított workerek ugyanezt látják.
+os.environ.setdefault("DUPLICATE_FINDER_WORKERS", str(max(1, (os.cpu_count() or 2) - 1)))
+try:
+    MAX_WORKERS = max(1, int(os.environ["DUPLICATE_FINDER_WORKERS"]))
+except ValueError:
+    MAX_WORKERS = max(1, (os.cpu_count() or 2) - 1)
 # Memóriahasználat becslése a különböző stratégiákhoz
 FAST_MODE_MEMORY_FACTOR = 0.4 # A 'fast' mód becsült memóriaigénye a fájlok teljes méretének 40%-a
 SAFE_MODE_MEMORY_FACTOR = 0.1 # A 'safe' mód becsült memóriaigénye a fájlok teljes méretének 10%
 RAM_USAGE_THRESHOLD = 0.70 # A RAM használatának maximális küszöbértéke a 'safe' és 'disk' módokhoz
+OUTPUT_SORT_BUFFER_ENTRIES = 1_000_000  # Ennyi kimeneti bejegyzés felett a rendezett futamok ideiglenes fájlba kerülnek
+LINE_LENGTH_SAMPLE_BYTES = 4 * 1024 * 1024  # Az átlagos sorhossz becsléséhez beolvasott minta mérete (4 MB)
+MEMORY_CHECK_INTERVAL = 16  # A 'fast' mód ennyi feldolgozott fájlonként ellenőrzi a rendszer memóriahasználatát
+TASK_CHUNKS_PER_WORKER = 4  # A feladatokat workerenként kb. ennyi kötegben küldjük el (ld. map_tasks)
+TASK_BATCHES_IN_FLIGHT = 2  # Workerenként legfeljebb ennyi köteg van egyszerre beküldve (visszanyomás)
+# A workerek indítási módja: a 'forkserver' egy kis kiszolgálóprocesszből forkol, így a workerek nem
+# öröklik a koordinátor (a stratégiák során megnőtt) memóriáját. A Nuitka-val lefordított programban,
+# illetve ahol nem érhető el, a platform alapértelmezett módja marad.
+WORKER_START_METHOD = ('forkserver' if 'forkserver' in multiprocessing.get_all_start_methods()
+                       and "__compiled__" not in globals() else None)
+PROGRESS_MININTERVAL = 0.5  # A feladatonkénti progress bar-ok legfeljebb ennyi másodpercenként frissülnek
+# A rekordonkénti (forró) ciklusok progress bar-ja: a tqdm csak ennyi elemenként nézi meg az órát,
+# és legfeljebb másodpercenként frissít; nem terminálra írt kimenetnél ki van kapcsolva
+PROGRESS_HOT_LOOP_MINITERS = 100_000
+PROGRESS_HOT_LOOP_MININTERVAL = 1.0
 DISK_CHUNK_SIZE_MB = 128  # 128 MB-os darabokban dolgozzuk fel a fájlokat disk módban
-HASH_FUNCTION = get_hash_function()  # A kiválasztott hash-függvény
+SAFE_PASS1_RANGE_MB = 128  # A 'safe' mód első fázisában ekkora (sorhatárra igazított) fájlszeletek külön feladatok
+READ_BLOCK_SIZE = 8 * 1024 * 1024  # Az előolvasó szál által egyszerre beolvasott blokk mérete (8 MB)
+READ_AHEAD_BLOCKS = 4  # Legfeljebb ennyi beolvasott blokk várakozhat feldolgozásra (korlátos memória)
+WRITE_BUFFER_SIZE = 4 * 1024 * 1024  # Az átírt és az ideiglenes fájlok írásakor ekkora adagokban írunk (4 MB)
+MERGE_WRITE_BATCH = 65536  # A 'disk' mód összefésülésekor ennyi rekordot írunk ki egyetlen write hívással
+MERGE_PREFETCH_BYTES = 4 * 1024 * 1024  # Az ideiglenes rekordfájlok olvasópuffere fájlonként (4 MB előolvasás)
+# Egy összefésülés összes olvasópufferének felső korlátja: sok fájlnál fájlonként ennek arányos része
+# jut (legalább MERGE_PREFETCH_MIN_BYTES), így a 'disk' mód memóriaigénye nem nő a csoportmérettel
+MERGE_PREFETCH_BUDGET_BYTES = 64 * 1024 * 1024
+MERGE_PREFETCH_MIN_BYTES = 64 * 1024
+DISK_READ_RECORDS = 4096  # Az ideiglenes rekordfájlokat ennyi rekordos blokkokban olvassuk és bontjuk fel
+MERGE_BATCH_SIZE_MAX = 256  # Legfeljebb ennyi ideiglenes fájlt fésülünk össze egyszerre (nyitott fájlok korlátja)
+HASH_BITS_CHOICES = (32, 64)  # A választható hash-kulcs szélességek (bit)
+DELETE_HASH_BITS = 64  # Duplikátumtörléskor ennyi bites kulcsokat használunk (32 biten az ütközés törölne)
+# Előre létrehozott hash-függvények bitszélesség szerint (a workerek is ezt használják)
+HASH_FUNCTIONS = {bits: get_hash_function(bits) for bits in HASH_BITS_CHOICES}
+# A 'disk' mód ideiglenes fájljainak bináris rekordfejléce hash-szélesség szerint:
+# hash, fájl ID, prefix hossza (bájt); a fejlécet a fájlonként rögzített szélességű, nullákkal
+# kitöltött prefixmező követi. A big-endian bájtsorrend miatt a nyers rekordok bájtonkénti
+# összehasonlítása a (hash, fájl ID) sorrendet adja.
+DISK_RECORD_STRUCTS = {64: struct.Struct('>QIH'), 32: struct.Struct('>IIH')}
+DISK_FILE_HEADER = struct.Struct('>H')  # Az ideiglenes fájl eleje: a prefixmező szélessége (bájt)
+DISK_ZSTD_LEVEL = 1  # A 'disk' mód ideiglenes fájljainak zstd tömörítési szintje (a leggyorsabb szint)
+DISK_TEMP_SUFFIX = ".tmp.zst" if ZSTD_AVAILABLE else ".tmp"  # Az ideiglenes rekordfájlok kiterjesztése
+# A 'safe' mód előszűrője: ennyi bemeneti bájtra jut egy rés (bit), legalább SAFE_SKETCH_MIN_SLOTS réssel
+SAFE_SKETCH_BYTES_PER_SLOT = 8
+SAFE_SKETCH_MIN_SLOTS = 1 << 16
 
 # --- Naplózás Beállítása ---
 def setup_logger() -> Tuple[logging.Logger, logging.Logger]:
@@ -151,20 +228,232 @@ def setup_logger() -> Tuple[logging.Logger, logging.Logger]:
     return logger, file_only_logger
 
 # --- Segédfüggvények ---
-def normalize_line(line: str, delimiter: str, count: int) -> str:
+@functools.lru_cache(maxsize=None)
+def make_normalizer(delimiter: AnyStr, count: int) -> Callable[[AnyStr], AnyStr]:
+    """
+    Létrehoz egy adott elválasztóra és mezőszámra specializált normalizáló függvényt
+    (a bemenet egy már 'strip'-elt sor, str vagy bytes - az elválasztó típusával egyezően).
+    A mezőszámot egy előre lefordított reguláris kifejezésbe építjük be, így a sor
+    feldarabolása és a hosszú maradék lemásolása helyett egyetlen C-szintű illesztés
+    adja meg az első 'count' mező végét.
+    Az eredmény megegyezik a delimiter.join(line.split(delimiter, count)[:count]) kifejezéssel.
+    """
+    if count <= 0 or not delimiter:
+        # Szélsőséges paraméterek: az eredeti, általános kifejezés
+        return lambda line: delimiter.join(line.split(delimiter, count)[:count])
+
+    escaped = re.escape(delimiter)
+    if len(delimiter) == 1:
+        template, args, flags = "(?:[^%s]*%s){%d}", (escaped, escaped, count), 0
+    else:
+        template, args, flags = "(?:.*?%s){%d}", (escaped, count), re.DOTALL
+    if isinstance(delimiter, bytes):
+        template = template.encode('ascii')
+    pattern = re.compile(template % args, flags)
+    delimiter_length = len(delimiter)
+
+    def normalize(line: AnyStr, _match=pattern.match) -> AnyStr:
+        # Ha nincs legalább 'count' elválasztó, a teljes sor a kulcs
+        match = _match(line)
+        return line[:match.end() - delimiter_length] if match else line
+
+    return normalize
+
+def make_line_hasher(config: Dict[str, Any]) -> Callable[[bytes], int]:
     """
-    Normalizál egy sort: eltávolítja a felesleges szóközöket,
-    majd a megadott elválasztó mentén feldarabolja, és csak az első 'count' darabot fűzi össze újra.
-    Ez biztosítja, hogy csak a releváns részek kerüljenek a hash-be.
+    Összeállítja a soronkénti "kernelt": egy 'strip'-elt, nyers bájtos sorból közvetlenül
+    előállítja a hash-t (normalizálás + hash-elés). A sorokat nem dekódoljuk és nem kódoljuk
+    újra UTF-8-ra, a normalizáló és a hash-függvény pedig fájlonként egyszer kötődik meg.
+    Minden worker és a duplikátumtörlés is ezt használja, így a hash-ek mindenhol egyeznek.
     """
-    return delimiter.join(line.strip().split(delimiter, count)[:count])
+    normalize = make_normalizer(config['hash_delimiter'].encode('utf-8'), config['hash_fields'])
+    hash_function = HASH_FUNCTIONS[config['hash_bits']]
+    return lambda stripped_line: hash_function(normalize(stripped_line))
 
-def hash_normalized_line(line_part: str) -> str:
+def decode_prefix(stripped_line: bytes, write_length: int) -> str:
     """
-    A normalizált sorrészletet hash-eli a kiválasztott algoritmussal.
-    A sort UTF-8 kódolású bájtokká alakítja a hash-elés előtt.
+    Előállítja a kiírandó sor-prefixet egy bájtos sorból. Csak a prefixhez szükséges
+    bájtokat dekódolja (egy UTF-8 karakter legfeljebb 4 bájt), nem a teljes sort.
     """
-    return HASH_FUNCTION(line_part.encode('utf-8'))
+    return stripped_line[:write_length * 4].decode('utf-8', errors='ignore')[:write_length]
+
+def encode_prefix(stripped_line: bytes, write_length: int) -> bytes:
+    """
+    A kiírandó sor-prefix UTF-8 bájtjai (a 'disk' mód bináris rekordjaihoz).
+    Tisztán ASCII prefixnél a bájtok változatlanul átvehetők, dekódolás nélkül.
+    """
+    prefix = stripped_line[:write_length]
+    if prefix.isascii():
+        return prefix
+    return decode_prefix(stripped_line, write_length).encode('utf-8')
+
+def get_disk_record_struct(record_struct: struct.Struct, prefix_width: int) -> struct.Struct:
+    """A fejlécből és egy prefix_width bájtos prefixmezőből álló, rögzített hosszú rekord formátuma."""
+    return struct.Struct(f"{record_struct.format}{prefix_width}s")
+
+def write_disk_records(f_out, records: List[Tuple[int, int, bytes]], record_struct: struct.Struct):
+    """
+    Kiírja a (hash, fájl ID, prefix bájtok) rekordokat a 'disk' mód bináris formátumában.
+    A prefixmező szélessége a leghosszabb prefixé; ezt a fájl elejére írjuk, így a rekordok
+    rögzített hosszúak, és blokkonként, C-szinten bonthatók fel (ld. iter_disk_records).
+    A rekordokat egy pufferben gyűjti, és WRITE_BUFFER_SIZE adagokban írja ki.
+    """
+    prefix_width = max(map(len, map(operator.itemgetter(2), records)), default=0)
+    pack = get_disk_record_struct(record_struct, prefix_width).pack
+    out_buffer = bytearray(DISK_FILE_HEADER.pack(prefix_width))
+    for h, fid, prefix in records:
+        out_buffer += pack(h, fid, len(prefix), prefix)  # Az 's' mezőt a struct nullákkal tölti ki
+        if len(out_buffer) >= WRITE_BUFFER_SIZE:
+            f_out.write(out_buffer)
+            out_buffer.clear()
+    f_out.write(out_buffer)
+
+def open_disk_records(file_path: Path, mode: str, buffer_size: int = MERGE_PREFETCH_BYTES):
+    """
+    Megnyit egy 'disk' módú ideiglenes rekordfájlt írásra ('wb') vagy olvasásra ('rb').
+    Ha a zstandard elérhető, a rekordok zstd-tömörítve kerülnek a lemezre: a rekordok (egész
+    kulcsok, ismétlődő prefixek) jól tömöríthetők, így kevesebb a lemezírás és a helyigény.
+    Olvasáskor fájlonként buffer_size méretű előolvasó puffert használ.
+    """
+    if not ZSTD_AVAILABLE:
+        return file_path.open(mode, buffering=buffer_size if mode == 'rb' else -1)
+    if mode == 'wb':
+        return zstandard.ZstdCompressor(level=DISK_ZSTD_LEVEL).stream_writer(file_path.open('wb'))
+    # A pufferelt olvasó garantálja, hogy a read(n) hívások teljes rekordrészeket adjanak vissza
+    return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(file_path.open('rb')), buffer_size)
+
+def read_disk_prefix_width(file_path: Path) -> int:
+    """Visszaadja egy ideiglenes rekordfájl prefixmezőjének szélességét (a fájl fejlécéből)."""
+    with open_disk_records(file_path, 'rb', DISK_FILE_HEADER.size) as f:
+        return DISK_FILE_HEADER.unpack(f.read(DISK_FILE_HEADER.size))[0]
+
+def iter_disk_records(file_path: Path, record_struct: struct.Struct, raw_width: int = None,
+                      buffer_size: int = MERGE_PREFETCH_BYTES) -> Iterator:
+    """
+    Visszaolvassa a write_disk_records által írt rekordokat (hash, fájl ID, prefix hossza, kitöltött
+    prefixmező) tuple-ökként; a prefix bájtjai: prefixmező[:prefix hossza].
+    raw_width megadásakor a nyers rekordokat adja vissza bytes objektumként, raw_width bájtos
+    prefixmezőre kiegészítve: ezek bájtonként összehasonlíthatók és változatlanul visszaírhatók,
+    így az összefésülésnek nem kell kicsomagolnia és újra becsomagolnia őket.
+    A rögzített hosszú rekordokat blokkonként, egyetlen iter_unpack hívással bontjuk fel; az olvasópuffer
+    és a blokk is legfeljebb kb. buffer_size bájtos.
+    """
+    with open_disk_records(file_path, 'rb', buffer_size) as f:
+        prefix_width = DISK_FILE_HEADER.unpack(f.read(DISK_FILE_HEADER.size))[0]
+        record = get_disk_record_struct(record_struct, prefix_width)
+        # Blokkhatáron mindig teljes rekord ér véget
+        block_size = record.size * max(1, min(DISK_READ_RECORDS, buffer_size // record.size))
+        if raw_width is not None:
+            record = struct.Struct(f"{record.size}s")
+        while True:
+            block = f.read(block_size)
+            if not block:
+                return  # Fájl vége
+            records = record.iter_unpack(block)
+            if raw_width is None:
+                yield from records
+            elif raw_width == prefix_width:
+                yield from map(operator.itemgetter(0), records)
+            else:
+                # Keskenyebb prefixmezőjű fájl: a rekordokat a kimenet szélességére egészítjük ki
+                padded_size = record_struct.size + raw_width
+                yield from (raw.ljust(padded_size, b'\0') for (raw,) in records)
+
+def _read_blocks_ahead(file_path: Path, block_queue: queue.Queue, stop_event: threading.Event, start: int = 0, end: int = None):
+    """
+    Előolvasó szál törzse: a fájlt memóriába képezi (mmap), és a [start, end) bájttartományból
+    (alapértelmezés: a teljes fájl) sorhatáron vágott, kb. READ_BLOCK_SIZE méretű blokkokat tesz
+    a korlátos sorba. A blokk kivágása egyetlen másolás
+    (nincs külön olvasási puffer és félbemaradt sor összefűzés), és a GIL fel van oldva alatta,
+    így az olvasás átfedésben van a hívó szál hash-elésével.
+    A fájl végét egy üres blokk, a hibát maga a kivétel objektum jelzi.
+    """
+    def put(block) -> bool:
+        # Várakozás szabad helyre, amíg a fogyasztó le nem állítja a szálat
+        while not stop_event.is_set():
+            try:
+                block_queue.put(block, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    try:
+        with file_path.open('rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            end = size if end is None else min(end, size)
+            if size:  # Üres fájl nem képezhető le
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    if hasattr(mm, 'madvise') and hasattr(mmap, 'MADV_SEQUENTIAL'):
+                        mm.madvise(mmap.MADV_SEQUENTIAL)  # Agresszívabb előolvasás a kernelben
+                    pos = start
+                    while pos < end:
+                        # A blokk az utolsó, a blokkméreten belüli '\n' után ér véget
+                        cut = mm.rfind(b'\n', pos, min(pos + READ_BLOCK_SIZE, end)) + 1
+                        if cut <= pos:
+                            # A blokkméretnél hosszabb sor: a következő sorvégig (vagy a tartomány végéig) vágunk
+                            cut = mm.find(b'\n', pos + READ_BLOCK_SIZE, end) + 1 or end
+                        if not put(mm[pos:cut]):
+                            return
+                        pos = cut
+        put(b'')
+    except Exception as e:
+        put(e)  # Leállított fogyasztó és teli sor esetén sem blokkolhat örökre
+
+def iter_line_blocks(file_path: Path, skip_header: bool = True, start: int = 0, end: int = None) -> Iterator[List[bytes]]:
+    """
+    Blokkonként adja vissza egy fájl (nyers bájtos, '\n' nélküli) sorait; start/end megadásával
+    csak egy sorhatárra igazított bájttartományét (ld. split_file_ranges).
+    Egy háttérszál előre kivágja a következő blokkokat (legfeljebb READ_AHEAD_BLOCKS darabot),
+    így a lemezolvasás és a sorok feldolgozása párhuzamosan zajlik.
+    A sorokat nem dekódoljuk: a hash-elés közvetlenül a bájtokon történik.
+    """
+    block_queue = queue.Queue(maxsize=READ_AHEAD_BLOCKS)
+    stop_event = threading.Event()
+    reader = threading.Thread(target=_read_blocks_ahead, args=(file_path, block_queue, stop_event, start, end), daemon=True)
+    reader.start()
+
+    header_pending = skip_header
+    try:
+        while True:
+            block = block_queue.get()
+            if isinstance(block, Exception):
+                raise block
+            if not block:
+                break  # Fájl vége
+
+            lines = block.split(b'\n')
+            if not lines[-1]:
+                lines.pop()  # Az utolsó '\n' utáni üres elem (a fájl utolsó sora sorvége nélküli is lehet)
+            if header_pending:
+                del lines[0]  # Fejléc átugrása
+                header_pending = False
+            if lines:
+                yield lines
+    finally:
+        stop_event.set()
+        reader.join()
+
+def iter_file_lines(file_path: Path, skip_header: bool = True) -> Iterator[bytes]:
+    """Soronként járja be a fájlt az előolvasó szálas blokkolvasóval (ld. iter_line_blocks)."""
+    return itertools.chain.from_iterable(iter_line_blocks(file_path, skip_header))
+
+def split_file_ranges(file_path: Path, range_size: int) -> List[Tuple[int, int]]:
+    """
+    Felosztja a fájlt kb. range_size méretű, sorhatárra igazított [start, end) bájttartományokra,
+    hogy egyetlen nagy fájl is több workeren párhuzamosan feldolgozható legyen.
+    """
+    size = file_path.stat().st_size
+    bounds = [0]
+    with file_path.open('rb') as f:
+        while bounds[-1] + range_size < size:
+            f.seek(bounds[-1] + range_size)
+            f.readline()  # A határ a következő sor elejére kerül
+            if f.tell() >= size:
+                break
+            bounds.append(f.tell())
+    bounds.append(size)
+    return list(zip(bounds, bounds[1:]))
 
 def get_input_files(input_dir: Path, file_pattern: str, logger: logging.Logger) -> List[Path]:
     """
@@ -176,45 +465,240 @@ def get_input_files(input_dir: Path, file_pattern: str, logger: logging.Logger)
         return []
 
     logger.info(f"Fájlok keresése a '{input_dir}' könyvtárban a következő mintával: '{file_pattern}'")
-    # A glob használatával keresi a mintának megfelelő fájlokat
-    files = [f for f in input_dir.glob(file_pattern) if f.is_file()]
+    if '/' in file_pattern or os.sep in file_pattern:
+        # Alkönyvtárakra is kiterjedő minta: a glob kezeli
+        sized_files = [(f.stat().st_size, f) for f in input_dir.glob(file_pattern) if f.is_file()]
+    else:
+        # Egyetlen könyvtárbejárás: a DirEntry a könyvtár olvasásakor kapott adatokat (típus, Windows-on
+        # a méret is) gyorsítótárazza, így fájlonként nem kell külön stat hívás
+        with os.scandir(input_dir) as entries:
+            sized_files = [(entry.stat().st_size, Path(entry.path)) for entry in entries
+                           if entry.is_file() and fnmatch.fnmatch(entry.name, file_pattern)]
+    # Az üres fájlokban nincs feldolgozandó sor (fejléc sem), ezért ezekhez nem indítunk feladatot
+    sized_files = [(size, f) for size, f in sized_files if size > 0]
     # A fájlokat méret szerint rendezi, a kisebbekkel kezdve
-    files.sort(key=lambda f: f.stat().st_size)
+    sized_files.sort(key=operator.itemgetter(0))
+    files = [f for _, f in sized_files]
 
     if not files:
         logger.warning(f"Nincsenek a '{file_pattern}' mintának megfelelő feldolgozható fájlok a(z) '{input_dir}' könyvtárban.")
 
     return files
 
-def write_duplicates(duplicates_data: Dict[str, List[str]], output_file: Path, logger: logging.Logger):
+def _with_deleted_count(filename: str, deleted_counts: Dict[str, int]) -> str:
+    """A fájlnévhez fűzi a belőle törölt sorok számát (ha volt törlés)."""
+    deleted = deleted_counts.get(filename) if deleted_counts else None
+    return f"{filename} -> Törölve {deleted} sor" if deleted else filename
+
+class DuplicatesWriter:
+    """
+    A duplikátumok növekményes kiírása. A bejegyzések (prefix, fájlnevek) tetszőleges sorrendben
+    érkezhetnek; a writer legfeljebb OUTPUT_SORT_BUFFER_ENTRIES bejegyzést tart a memóriában, a többit
+    prefix szerint rendezett futamokban ideiglenes fájlokba írja, és lezáráskor ezeket összefésülve,
+    prefix szerint rendezve írja ki a kimenetet. Azonos prefixnél a később érkezett bejegyzés érvényes.
+    """
+
+    def __init__(self, output_file: Path, logger: logging.Logger):
+        self.output_file = output_file
+        self.logger = logger
+        self.listed_names = set()  # A bejegyzésekben szereplő összes fájlnév
+        self._buffer = {}  # Prefix -> fájlnevek (a még ki nem írt bejegyzések)
+        self._runs = []  # A prefix szerint rendezett futamok ideiglenes fájljai
+
+    def write(self, prefix: str, file_names: List[str]):
+        """Egy duplikált sor prefixének és a fájlneveknek a felvétele a kimenetbe."""
+        self._buffer[prefix] = file_names
+        self.listed_names.update(file_names)
+        if len(self._buffer) >= OUTPUT_SORT_BUFFER_ENTRIES:
+            self._spill()
+
+    def _spill(self):
+        """A puffer rendezett futamként egy névtelen ideiglenes fájlba kerül."""
+        run_file = tempfile.TemporaryFile()
+        pickler = pickle.Pickler(run_file, pickle.HIGHEST_PROTOCOL)
+        for entry in sorted(self._buffer.items()):
+            pickler.dump(entry)
+            pickler.clear_memo()
+        self._buffer.clear()
+        self._runs.append(run_file)
+
+    @staticmethod
+    def _iter_run(run_file, run_index: int) -> Iterator[Tuple[str, int, List[str]]]:
+        """Egy futam bejegyzései (prefix, futam sorszáma, fájlnevek) alakban."""
+        run_file.seek(0)
+        unpickler = pickle.Unpickler(run_file)
+        while True:
+            try:
+                prefix, file_names = unpickler.load()
+            except EOFError:
+                return
+            yield prefix, run_index, file_names
+
+    def _iter_sorted(self) -> Iterator[Tuple[str, List[str]]]:
+        """A bejegyzések prefix szerint rendezve; azonos prefixnél a legkésőbbi futamé érvényes."""
+        if not self._runs:
+            yield from sorted(self._buffer.items())
+            return
+        self._spill()
+        merged = heapq.merge(*(self._iter_run(run_file, i) for i, run_file in enumerate(self._runs)))
+        for prefix, group in itertools.groupby(merged, key=operator.itemgetter(0)):
+            *_, (_, _, file_names) = group
+            yield prefix, file_names
+
+    def close(self, inter_deleted_counts: Dict[str, int] = None, intra_deleted_counts: Dict[str, int] = None):
+        """
+        Kiírja a kimeneti fájlt. Duplikátumtörlés után a fájlonkénti törölt sorszámokat
+        (fájlok közötti / fájlon belüli) csak itt, a kiíráskor fűzzük a fájlnevekhez.
+        """
+        if not self._buffer and not self._runs:
+            self.logger.info("Nem található duplikált sor (sem fájlon belül, sem fájlok között).")
+            with self.output_file.open('w', encoding='utf-8') as f:
+                f.write("Nem található duplikátum.\n")
+            return
+
+        self.logger.info(f"Duplikált sorok kiírása a(z) '{self.output_file}' fájlba...")
+        written = 0
+        try:
+            with self.output_file.open('w', encoding='utf-8') as f:
+                # A duplikátumok prefix szerint rendezve kerülnek ki a konzisztens kimenetért
+                for prefix, file_names in self._iter_sorted():
+                    f.write(f"{prefix}\n")
+                    # Ha csak egy fájlnév van, az fájlon belüli duplikátumot jelent
+                    if len(file_names) == 1:
+                        f.write(f"    - (Fájlon belüli duplikátumok) {_with_deleted_count(file_names[0], intra_deleted_counts)}\n")
+                    else:
+                        # Különben listázza az összes fájlt, ahol előfordult
+                        for filename in sorted(file_names):
+                            f.write(f"    - {_with_deleted_count(filename, inter_deleted_counts)}\n")
+                    written += 1
+            self.logger.info(f"A duplikátumok kiírása befejeződött ({written} duplikált sor).")
+        except IOError as e:
+            self.logger.error(f"Hiba a kimeneti fájl írása közben: {e}")
+        finally:
+            for run_file in self._runs:
+                run_file.close()
+            self._runs.clear()
+            self._buffer.clear()
+
+def write_duplicates(duplicates_data: Dict[str, List[str]], output_file: Path, logger: logging.Logger,
+                     inter_deleted_counts: Dict[str, int] = None, intra_deleted_counts: Dict[str, int] = None):
     """
-    Kiírja a talált duplikátumokat a megadott kimeneti fájlba.
+    Kiírja a talált duplikátumokat a megadott kimeneti fájlba (ld. DuplicatesWriter).
     A kulcs a duplikált sor prefixe, az érték a fájlnevek listája.
     """
-    if not duplicates_data:
-        logger.info("Nem található duplikált sor (sem fájlon belül, sem fájlok között).")
-        with output_file.open('w', encoding='utf-8') as f:
-            f.write("Nem található duplikátum.\n")
-        return
+    writer = DuplicatesWriter(output_file, logger)
+    for prefix, file_names in duplicates_data.items():
+        writer.write(prefix, file_names)
+    writer.close(inter_deleted_counts, intra_deleted_counts)
+
+def make_sketch_mask(files: List[Path]) -> int:
+    """
+    A 'safe' mód előszűrőjének résmaszkja. A rések száma kettő hatványa, a bemenet teljes
+    méretéhez igazítva, így egy hash rése egyszerű maszkolással (h & mask) adódik.
+    """
+    total_size = sum(f.stat().st_size for f in files)
+    slots = max(SAFE_SKETCH_MIN_SLOTS, total_size // SAFE_SKETCH_BYTES_PER_SLOT)
+    return (1 << (slots - 1).bit_length()) - 1
 
-    logger.info(f"{len(duplicates_data)} duplikált sor kiírása a(z) '{output_file}' fájlba...")
-    # A duplikátumokat prefix szerint rendezi a konzisztens kimenetért
-    sorted_prefixes = sorted(duplicates_data.keys())
+def add_to_sketch(seen: bytearray, collided: bytearray, hashes: Iterable[int], mask: int, repeated: bool):
+    """
+    Beírja a hash-eket a kétbites előszűrőbe: a 'seen' bitkép a már látott réseket, a 'collided'
+    a legalább kétszer eltalált réseket jelöli. A fájlon belül ismétlődő hash-ek ('repeated')
+    rése azonnal ütközőnek számít.
+    """
+    for h in hashes:
+        slot = h & mask
+        byte_index, bit = slot >> 3, 1 << (slot & 7)
+        if repeated or seen[byte_index] & bit:
+            collided[byte_index] |= bit
+        seen[byte_index] |= bit
+
+def count_set_bits(bitmap, block_size: int = 1024 * 1024) -> int:
+    """
+    Megszámolja a bitképben beállított biteket blokkonként, így a teljes bitkép egyetlen óriási
+    egész számmá (és bináris stringgé) alakítása nélkül is elég kis többletmemória kell.
+    """
+    total = 0
+    for start in range(0, len(bitmap), block_size):
+        value = int.from_bytes(bitmap[start:start + block_size], 'little')
+        # int.bit_count csak Python 3.10-től érhető el
+        total += value.bit_count() if hasattr(value, 'bit_count') else bin(value).count('1')
+    return total
+
+def check_memory_pressure(logger: logging.Logger) -> bool:
+    """
+    Ha a rendszer memóriahasználata meghaladja a RAM_USAGE_THRESHOLD küszöböt, figyelmeztetést
+    naplóz, és True-t ad vissza (a hívó ezután nem ellenőriz újra, így a figyelmeztetés egyszeri).
+    Szemétgyűjtést nem futtat: az egyesített szótárak élő objektumok, azokon nem segítene.
+    psutil nélkül nem ellenőriz semmit.
+    """
+    if not PSUTIL_AVAILABLE:
+        return False
+    used_percent = psutil.virtual_memory().percent
+    if used_percent <= RAM_USAGE_THRESHOLD * 100:
+        return False
+    logger.warning(f"Magas memóriahasználat: {used_percent:.1f}% (küszöb: {RAM_USAGE_THRESHOLD:.0%}). "
+                   "Memóriahiány esetén használja a 'safe' vagy 'disk' stratégiát.")
+    return True
 
-    try:
-        with output_file.open('w', encoding='utf-8') as f:
-            for prefix in sorted_prefixes:
-                f.write(f"{prefix}\n")
-                # Ha csak egy fájlnév van, az fájlon belüli duplikátumot jelent
-                if len(duplicates_data[prefix]) == 1:
-                    f.write(f"    - (Fájlon belüli duplikátumok) {duplicates_data[prefix][0]}\n")
-                else:
-                    # Különben listázza az összes fájlt, ahol előfordult
-                    for filename in sorted(duplicates_data[prefix]):
-                        f.write(f"    - {filename}\n")
-        logger.info("A duplikátumok kiírása befejeződött.")
-    except IOError as e:
-        logger.error(f"Hiba a kimeneti fájl írása közben: {e}")
+# --- Worker processzek közös beállítása ---
+# A beállításokat a pool indításakor egyszer kapja meg minden worker (ld. _init_worker), így a
+# feladatonkénti argumentumokból kimaradhat a config szótár pickle-je.
+_WORKER_CONFIG: Dict[str, Any] = {}
+
+def _init_worker(config: Dict[str, Any]):
+    """A process pool inicializálója: eltárolja a futás beállításait a worker processzben."""
+    _WORKER_CONFIG.update(config)
+
+def create_worker_pool(config: Dict[str, Any]) -> ProcessPoolExecutor:
+    """A teljes futás alatt élő process pool, amelyet minden fázis és stratégia közösen használ."""
+    return ProcessPoolExecutor(max_workers=MAX_WORKERS, mp_context=multiprocessing.get_context(WORKER_START_METHOD),
+                               initializer=_init_worker, initargs=(config,))
+
+def _run_task_batch(func: Callable, arg_batch: List[Tuple]) -> List[Tuple[Any, str]]:
+    """
+    Worker oldali burkoló a map_tasks-hoz: egy köteg feladat (eredmény, None) vagy hiba esetén
+    (None, traceback szöveg) párjai. Így egy hibás feladat nem veszi el a köteg többi eredményét.
+    """
+    results = []
+    for args in arg_batch:
+        try:
+            results.append((func(*args), None))
+        except Exception:
+            results.append((None, traceback.format_exc()))
+    return results
+
+def map_tasks(executor: ProcessPoolExecutor, func: Callable, arg_tuples: List[Tuple]) -> Iterator[Tuple[int, Any, str]]:
+    """
+    Lefuttatja a func(*args) feladatokat a poolban, és a befejeződés sorrendjében adja vissza az
+    (index, eredmény, hiba) hármasokat (index: a feladat helye arg_tuples-ben; hiba: a worker
+    oldali traceback szövege, vagy None).
+    A feladatokat kötegekben küldjük (workerenként kb. TASK_CHUNKS_PER_WORKER köteg), így sok kis
+    fájlnál nem feladatonként egy IPC üzenetváltás a költség. A kötegek lépésközös szeletek
+    (arg_tuples[i::n]): a méret szerint rendezett fájlok, illetve egy fájl szomszédos bájttartományai
+    így nem egyetlen kötegbe (egyetlen workerre) kerülnek. Egyszerre legfeljebb
+    TASK_BATCHES_IN_FLIGHT köteg vár workerenként, és egy lassú köteg nem tartja vissza a már
+    elkészült eredmények feldolgozását.
+    """
+    chunksize = max(1, len(arg_tuples) // (MAX_WORKERS * TASK_CHUNKS_PER_WORKER))
+    batch_count = -(-len(arg_tuples) // chunksize)  # Felfelé kerekített osztás
+    batch_starts = iter(range(batch_count))
+    pending = {}  # Beküldött köteg -> az első feladatának indexe
+
+    def submit_next_batch():
+        start = next(batch_starts, None)
+        if start is not None:
+            pending[executor.submit(_run_task_batch, func, arg_tuples[start::batch_count])] = start
+
+    for _ in range(MAX_WORKERS * TASK_BATCHES_IN_FLIGHT):
+        submit_next_batch()
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            start = pending.pop(future)
+            submit_next_batch()  # Egy köteg elkészült: a következőt azonnal beküldjük
+            for offset, (result, error) in enumerate(future.result()):
+                yield start + offset * batch_count, result, error
 
 # --- ÚJ, Sorszámláló segédfüggvények ---
 def count_lines_worker(file_path: Path) -> int:
@@ -226,113 +710,128 @@ def count_lines_worker(file_path: Path) -> int:
         # Hiba esetén 0-t ad vissza, a hiba naplózása a hívó oldalon történik.
         return 0
 
-def get_total_line_count(files: List[Path], logger: logging.Logger) -> int:
+def get_total_line_count(files: List[Path], logger: logging.Logger, executor: ProcessPoolExecutor) -> int:
     """
     Párhuzamosan megszámolja a megadott fájlokban lévő összes sort.
     """
     total_lines = 0
     logger.info(f"Összes sorszám számítása {len(files)} fájlban...")
-    with ProcessPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        future_to_file = {executor.submit(count_lines_worker, f): f for f in files}
+    results = map_tasks(executor, count_lines_worker, [(f,) for f in files])
         
-        for future in tqdm(as_completed(future_to_file), total=len(files), desc="Sorszámok számítása"):
-            file_path = future_to_file[future]
-            try:
-                line_count = future.result()
-                total_lines += line_count - 1 if line_count > 0 else 0 # Az első sor fejléc, ezért azt nem számoljuk bele
-            except Exception as e:
-                logger.error(f"Hiba a(z) '{file_path.name}' fájl sorszámának számítása közben: {e}")
+    for index, line_count, error in tqdm(results, total=len(files), desc="Sorszámok számítása", mininterval=PROGRESS_MININTERVAL):
+        file_path = files[index]
+        if error:
+            logger.error(f"Hiba a(z) '{file_path.name}' fájl sorszámának számítása közben:\n{error}")
+            continue
+        total_lines += line_count - 1 if line_count > 0 else 0 # Az első sor fejléc, ezért azt nem számoljuk bele
                 
     return total_lines
 # --- VÉGE: Sorszámláló segédfüggvények ---
 
-# --- ÚJ FÁJLON BELÜLI DUPLIKÁTUMTÖRLÉSI FUNKCIÓK ---
+# --- DUPLIKÁTUMTÖRLÉSI WORKER ÉS FÁJLON BELÜLI FUNKCIÓK ---
 
-def find_and_delete_intrafile_duplicates(file_path: Path, config: Dict[str, Any], logger: logging.Logger) -> int:
+def _start_rewrite(file_path: Path, keep_bytes: int):
     """
-    Megkeresi és törli a fájlon belüli duplikátumokat. Minden hash-hez csak az első előfordulást hagyja meg.
-    Visszaadja a törölt sorok számát.
+    Létrehozza az átíráshoz az ideiglenes fájlt az eredeti mellett (azonos fájlrendszer: az
+    os.replace atomi), és átmásolja bele az eredeti első keep_bytes bájtját (a már feldolgozott,
+    változatlan sorokat). A hívó felel a fájl lezárásáért és törléséért.
     """
-    # logger.info(f"Fájlon belüli duplikátumok keresése és törlése: {file_path.name}")
-    
+    # A nagy írási puffer miatt a soronkénti write hívások csak WRITE_BUFFER_SIZE-onként érik el a rendszert
+    temp_file = tempfile.NamedTemporaryFile(mode='wb', buffering=WRITE_BUFFER_SIZE, dir=file_path.parent, prefix=file_path.name + '.', suffix='.tmp', delete=False)
     try:
-        seen_hashes = set()
-        lines_to_keep = []
-        deleted_count = 0
-        
-        # Fájl beolvasása és duplikátumok szűrése
-        with file_path.open('r', encoding='utf-8', errors='ignore') as f:
-            # Fejléc megtartása
-            header = next(f, None)
-            if header:
-                lines_to_keep.append(header)
+        with file_path.open('rb') as source:
+            while keep_bytes > 0:
+                block = source.read(min(keep_bytes, READ_BLOCK_SIZE))
+                if not block:
+                    break
+                temp_file.write(block)
+                keep_bytes -= len(block)
+    except Exception:
+        temp_file.close()
+        os.unlink(temp_file.name)
+        raise
+    return temp_file
+
+def delete_duplicate_rows_from_file(file_path: Path, hashes_to_remove: Set[int], config: Dict[str, Any]) -> Tuple[int, int]:
+    """
+    Egyetlen átírással törli egy fájlból a fájlok közötti és a fájlon belüli duplikátumokat.
+    Egy sor akkor marad meg, ha a hash-e nincs a hashes_to_remove halmazban (fájlok közötti
+    duplikátum, amelyet egy másik fájl őriz meg), és a fájlban még nem fordult elő.
+    A fájlt folyamatosan (soronként) dolgozza fel, a sorokat nem gyűjti a memóriába. Az ideiglenes
+    fájl csak az első törlendő sornál jön létre, így a duplikátummentes fájlokat csak olvassuk.
+    Visszaadja a törölt sorok számát: (fájlok közötti, fájlon belüli).
+    Worker függvény: nem naplóz, a hibát a hívó kezeli.
+    """
+    hash_line = make_line_hasher(config)  # Ugyanaz a hash-elés, mint a workerekben
+    seen_hashes = set()
+    inter_deleted = intra_deleted = 0
+    temp_file = None
+    write_kept = None  # Az ideiglenes fájl (nagy pufferű) write metódusa, helyi névhez kötve
+    try:
+        with file_path.open('rb') as original_file:
+            next(original_file, None)  # A fejléc mindig megmarad
             
-            # Sorok feldolgozása
-            for line in f:
+            # Sorok szűrése
+            for line in original_file:
                 stripped_line = line.strip()
-                if not stripped_line:
-                    lines_to_keep.append(line)  # Üres sorok megtartása
-                    continue
-                
-                # Hash számítása
-                normalized = normalize_line(stripped_line, config['hash_delimiter'], config['hash_fields'])
-                line_hash = hash_normalized_line(normalized)
-                
-                # Első előfordulás megtartása, duplikátumok törlése
-                if line_hash not in seen_hashes:
-                    seen_hashes.add(line_hash)
-                    lines_to_keep.append(line)
-                else:
-                    deleted_count += 1
+                if stripped_line:
+                    line_hash = hash_line(stripped_line)
+                    if line_hash in hashes_to_remove:
+                        inter_deleted += 1
+                    elif line_hash in seen_hashes:
+                        intra_deleted += 1
+                    else:
+                        seen_hashes.add(line_hash)
+                        if temp_file is not None:
+                            write_kept(line)  # Első előfordulás megtartása
+                        continue
+                    # Első törlendő sor: az addig változatlan rész átmásolása az ideiglenes fájlba
+                    if temp_file is None:
+                        temp_file = _start_rewrite(file_path, original_file.tell() - len(line))
+                        write_kept = temp_file.file.write  # A wrapper megkerülése: közvetlenül a BufferedWriter
+                elif temp_file is not None:
+                    write_kept(line)  # Üres sorok megtartása
         
-        # Ha vannak törölendő sorok, fájl frissítése
-        if deleted_count > 0:
-            # Biztonsági mentés készítése
-            backup_path = file_path.with_suffix(file_path.suffix + '.backup')
-            shutil.copy2(file_path, backup_path)
-            
-            # Szűrt tartalom visszaírása
-            with file_path.open('w', encoding='utf-8') as f:
-                f.writelines(lines_to_keep)
-            
-            # Biztonsági mentés törlése (opcionális)
-            backup_path.unlink()
-            
-            #logger.info(f"Fájlon belüli duplikátumtörlés: {deleted_count} sor törölve a(z) '{file_path.name}' fájlból.")
-        #else:
-            #logger.info(f"Nincs fájlon belüli duplikátum a(z) '{file_path.name}' fájlban.")
+        if temp_file is not None:
+            temp_file.close()
+            # Az ideiglenes fájl atomi cseréje: az eredeti fájl vagy teljesen régi, vagy teljesen új
+            # tartalmú, így külön biztonsági másolatra (a fájl teljes újraolvasására) nincs szükség
+            shutil.copymode(file_path, temp_file.name)  # Csak a jogosultságok (a NamedTemporaryFile 0600-zal jön létre)
+            os.replace(temp_file.name, file_path)
         
-        return deleted_count
+        return inter_deleted, intra_deleted
         
-    except Exception as e:
-        logger.error(f"Hiba a fájlon belüli duplikátumtörlés során a(z) '{file_path.name}' fájlban: {e}")
-        return 0
+    except Exception:
+        # Takarítás hiba esetén
+        if temp_file is not None:
+            temp_file.close()
+            if os.path.exists(temp_file.name):
+                os.unlink(temp_file.name)
+        raise
 
 def count_intrafile_duplicates(file_path: Path, config: Dict[str, Any]) -> int:
     """
     Megszámolja egy fájlon belül a duplikált sorokat duplikátumtörlés nélkül.
     Visszaadja a duplikált sorok számát (az első előfordulás kivételével).
     """
+    hash_line = make_line_hasher(config)  # Normalizálás + hash-elés közvetlenül a bájtos sorokon
     try:
         seen_hashes = set()
         duplicate_count = 0
         
-        with file_path.open('r', encoding='utf-8', errors='ignore') as f:
-            next(f, None)  # Fejléc átugrása
-            for line in f:
-                stripped_line = line.strip()
-                if not stripped_line:
-                    continue
-                
-                # Hash számítása
-                normalized = normalize_line(stripped_line, config['hash_delimiter'], config['hash_fields'])
-                line_hash = hash_normalized_line(normalized)
-                
-                # Duplikátumok számlálása
-                if line_hash in seen_hashes:
-                    duplicate_count += 1
-                else:
-                    seen_hashes.add(line_hash)
+        for line in iter_file_lines(file_path):
+            stripped_line = line.strip()
+            if not stripped_line:
+                continue
+            
+            # Hash számítása
+            line_hash = hash_line(stripped_line)
+            
+            # Duplikátumok számlálása
+            if line_hash in seen_hashes:
+                duplicate_count += 1
+            else:
+                seen_hashes.add(line_hash)
         
         return duplicate_count
         
@@ -341,171 +840,106 @@ def count_intrafile_duplicates(file_path: Path, config: Dict[str, Any]) -> int:
 
 # --- FRISSÍTETT DUPLIKÁTUMTÖRLÉSI FUNKCIÓK ---
 
-def collect_duplicate_lines_for_deletion(files: List[Path], duplicates_data: Dict[str, List[str]], config: Dict[str, Any], logger: logging.Logger) -> Dict[str, Dict[str, List[str]]]:
+def plan_inter_file_deletions(files: List[Path], inter_file_hashes: Dict[int, Iterable[int]], logger: logging.Logger) -> Dict[int, Set[int]]:
     """
-    Összegyűjti a törlendő duplikált sorokat minden fájlból (csak fájlok közötti duplikátumokhoz).
-    Visszaad egy szótárat: {hash: {filename: [matching_lines]}}
+    Meghatározza, hogy mely fájlból mely hash-ek sorait kell törölni (csak fájlok közötti duplikátumokhoz).
+    A bemenet a stratégiák által már ismert {hash: [fájl ID-k]} hozzárendelés, így a fájlokat nem kell
+    újra beolvasni. Minden hash-nél a név szerint első fájl őrzi meg a sorokat, a többiből törlődnek.
+    Visszaad egy szótárat: {fájl ID: {törlendő hash-ek}}
     """
-    logger.info("--- DUPLIKÁTUMTÖRLÉS: Fájlok közötti törlendő sorok összegyűjtése ---")
-    
-    # Csak a fájlok közötti duplikátumokat vesszük figyelembe (több fájlban előforduló prefixek)
-    inter_file_duplicate_prefixes = {prefix for prefix, file_list in duplicates_data.items() if len(file_list) > 1}
-    
-    if not inter_file_duplicate_prefixes:
+    logger.info("--- DUPLIKÁTUMTÖRLÉS: Fájlok közötti törlendő hash-ek meghatározása ---")
+    if not inter_file_hashes:
         logger.info("Nincsenek fájlok közötti duplikátumok.")
         return {}
     
-    # Hash -> teljes sor mapping létrehozása
-    prefix_to_hash = {}
-    hash_to_files = defaultdict(set)
+    hashes_to_delete = defaultdict(set)
     
-    # Minden fájl átnézése a duplikált sorok megkeresésére
-    for file_path in tqdm(files, desc="Fájlok közötti duplikált sorok keresése"):
-        try:
-            with file_path.open('r', encoding='utf-8', errors='ignore') as f:
-                header = next(f, None)  # Fejléc mentése
-                for line in f:
-                    stripped_line = line.strip()
-                    if not stripped_line:
-                        continue
-                    
-                    # Prefix létrehozása
-                    prefix = stripped_line[:config['write_length']]
-                    
-                    # Ha ez a prefix fájlok közötti duplikátum
-                    if prefix in inter_file_duplicate_prefixes:
-                        # Hash számítása
-                        normalized = normalize_line(stripped_line, config['hash_delimiter'], config['hash_fields'])
-                        line_hash = hash_normalized_line(normalized)
-                        
-                        # Hash -> prefix mapping
-                        if line_hash not in prefix_to_hash:
-                            prefix_to_hash[line_hash] = prefix
-                        
-                        # Hash -> fájlok mapping
-                        hash_to_files[line_hash].add(file_path.name)
-                        
-        except Exception as e:
-            logger.error(f"Hiba a fájlok közötti duplikált sorok keresése közben a(z) '{file_path.name}' fájlban: {e}")
-    
-    # Csak azok a hash-ek érdekesek, amelyek több fájlban is előfordulnak
-    multi_file_duplicates = {h: files for h, files in hash_to_files.items() if len(files) > 1}
-    
-    logger.info(f"Összesen {len(multi_file_duplicates)} hash található több fájlban is.")
-    
-    # Most összegyűjtjük a tényleges sorokat minden hash-hez
-    lines_to_delete = defaultdict(lambda: defaultdict(list))
+    for line_hash, file_ids in inter_file_hashes.items():
+        # Fájlok sorba rendezése név szerint (első fájl = megmarad, többi = törlés)
+        sorted_ids = sorted(set(file_ids), key=lambda fid: files[fid].name)
+        if len(sorted_ids) < 2:
+            continue
+        
+        # Hash-enkénti részletek: csak DEBUG szinten, késleltetett formázással (forró ciklus)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Hash %016x: megtartás -> %s, törlés -> %s", line_hash, files[sorted_ids[0]].name, [files[fid].name for fid in sorted_ids[1:]])
+        
+        for fid in sorted_ids[1:]:
+            hashes_to_delete[fid].add(line_hash)
     
-    for file_path in tqdm(files, desc="Fájlok közötti törlendő sorok részletes összegyűjtése"):
-        try:
-            with file_path.open('r', encoding='utf-8', errors='ignore') as f:
-                header = next(f, None)
-                for line in f:
-                    stripped_line = line.strip()
-                    if not stripped_line:
-                        continue
-                    
-                    # Hash számítása
-                    normalized = normalize_line(stripped_line, config['hash_delimiter'], config['hash_fields'])
-                    line_hash = hash_normalized_line(normalized)
-                    
-                    # Ha ez a hash multi-file duplikátum
-                    if line_hash in multi_file_duplicates:
-                        lines_to_delete[line_hash][file_path.name].append(stripped_line)
-                        
-        except Exception as e:
-            logger.error(f"Hiba a fájlok közötti törlendő sorok részletes összegyűjtése közben a(z) '{file_path.name}' fájlban: {e}")
+    logger.info(f"Összesen {len(inter_file_hashes)} hash található több fájlban is.")
+    return hashes_to_delete
+
+def share_hashes_to_delete(hashes_to_delete: Dict[int, Set[int]]) -> Tuple[shared_memory.SharedMemory, Dict[int, Tuple[int, int]]]:
+    """
+    A fájlonként törlendő hash-halmazokat egyetlen megosztott memóriablokkba csomagolja
+    (egymás után, 64 bites előjel nélküli egészekként), így a workereknek feladatonként csak a blokk
+    nevét és a fájl szeletét kell átadni, a hash-eket nem kell pickle-lel sorosítani.
+    Visszaadja a blokkot és a {fájl ID: (eltolás, darabszám)} szeleteket. A blokk lezárása és
+    felszabadítása (close + unlink) a hívó feladata.
+    """
+    table = array('Q')
+    slices = {}
+    for fid, hash_set in hashes_to_delete.items():
+        slices[fid] = (len(table), len(hash_set))
+        table.extend(hash_set)
     
-    return lines_to_delete
+    nbytes = len(table) * table.itemsize
+    shm = shared_memory.SharedMemory(create=True, size=max(1, nbytes))  # Üres blokk nem hozható létre
+    shm.buf[:nbytes] = memoryview(table).cast('B')
+    return shm, slices
+
+def load_shared_hashes(shm_name: str, offset: int, count: int) -> Set[int]:
+    """Egy fájl törlendő hash-eit olvassa be halmazba a megosztott memóriablokkból (ld. share_hashes_to_delete)."""
+    if not count:
+        return set()
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        itemsize = array('Q').itemsize
+        with shm.buf[offset * itemsize:(offset + count) * itemsize] as raw, raw.cast('Q') as hashes:
+            return set(hashes)
+    finally:
+        shm.close()
 
-def delete_duplicate_rows(files: List[Path], lines_to_delete: Dict[str, Dict[str, List[str]]], duplicates_data: Dict[str, List[str]], config: Dict[str, Any], logger: logging.Logger) -> Dict[str, List[str]]:
+def delete_duplicates_worker(file_path: Path, shm_name: str, offset: int, count: int) -> Tuple[int, int]:
+    """A duplikátumtörlés worker függvénye: a törlendő hash-eket a megosztott memóriából veszi."""
+    return delete_duplicate_rows_from_file(file_path, load_shared_hashes(shm_name, offset, count), _WORKER_CONFIG)
+
+def delete_duplicate_rows(files: List[Path], hashes_to_delete: Dict[int, Set[int]], logger: logging.Logger, executor: ProcessPoolExecutor) -> Tuple[Dict[str, int], Dict[str, int]]:
     """
     Törli a duplikált sorokat a fájlokból. Minden hash esetében az első fájlban hagyja meg az első előfordulást,
-    a többi fájlból törli az összes előfordulást.
-    Ezután kezeli a fájlon belüli duplikátumokat is.
+    a többi fájlból törli az összes előfordulást (ld. plan_inter_file_deletions).
+    Ugyanabban az átírásban a fájlon belüli duplikátumokat is törli (ld. delete_duplicate_rows_from_file).
+    Visszaadja a fájlonként törölt sorok számát (fájlok közötti, fájlon belüli).
     """
     logger.info("--- DUPLIKÁTUMTÖRLÉS: Duplikált sorok törlése a fájlokból ---")
     
-    modified_duplicates_data = duplicates_data.copy()
     inter_file_deleted_counts = defaultdict(int)
     intra_file_deleted_counts = defaultdict(int)
     
-    # 1. FÁJLOK KÖZÖTTI DUPLIKÁTUMOK TÖRLÉSE
-    logger.info("1. Fájlok közötti duplikátumok törlése...")
+    # 1. FÁJLOK KÖZÖTTI ÉS FÁJLON BELÜLI DUPLIKÁTUMOK TÖRLÉSE (fájlonként egyetlen átírás)
+    logger.info("1. Fájlok közötti és fájlon belüli duplikátumok törlése...")
     
-    # Minden hash esetében meghatározzuk, hogy melyik fájlban hagyjuk meg az első előfordulást
-    for line_hash, file_lines_map in lines_to_delete.items():
-        if not file_lines_map:
-            continue
-            
-        # Fájlok sorba rendezése (első fájl = megmarad, többi = törlés)
-        sorted_files = sorted(file_lines_map.keys())
-        keep_file = sorted_files[0]  # Az első fájlban hagyjuk meg
-        delete_files = sorted_files[1:]  # A többi fájlból töröljük
-        
-        logger.info(f"Hash {line_hash[:8]}...: megtartás -> {keep_file}, törlés -> {delete_files}")
-        
-        # Törlés végrehajtása
-        for delete_file in delete_files:
-            file_path = None
-            for f in files:
-                if f.name == delete_file:
-                    file_path = f
-                    break
-            
-            if not file_path:
-                logger.warning(f"Nem található fájl: {delete_file}")
+    # A törlendő hash-ek egyetlen megosztott memóriablokkba kerülnek (nem sorosítjuk őket feladatonként)
+    shm, slices = share_hashes_to_delete(hashes_to_delete)
+    try:
+        # A fájlok egymástól függetlenül átírhatók, ezért párhuzamosan dolgozzuk fel őket
+        results = map_tasks(executor, delete_duplicates_worker, [(path, shm.name, *slices.get(fid, (0, 0))) for fid, path in enumerate(files)])
+        for index, result, error in tqdm(results, total=len(files), desc="Duplikátumtörlés", mininterval=PROGRESS_MININTERVAL):
+            file_path = files[index]
+            if error:
+                logger.error(f"Hiba a sorok törlése közben a(z) '{file_path.name}' fájlban:\n{error}")
                 continue
-                
-            lines_to_remove = file_lines_map[delete_file]
-            if delete_rows_from_file(file_path, lines_to_remove, logger):
-                inter_file_deleted_counts[delete_file] += len(lines_to_remove)
-    
-    # 2. FÁJLON BELÜLI DUPLIKÁTUMOK TÖRLÉSE
-    logger.info("2. Fájlon belüli duplikátumok törlése...")
-    
-    for file_path in tqdm(files, desc="Fájlon belüli duplikátumtörlés"):
-        intra_deleted = find_and_delete_intrafile_duplicates(file_path, config, logger)
-        if intra_deleted > 0:
-            intra_file_deleted_counts[file_path.name] = intra_deleted
-    
-    # 3. KIMENETI ADATOK FRISSÍTÉSE
-    # Fájlok közötti duplikátumok frissítése
-    for prefix, file_list in list(modified_duplicates_data.items()):
-        if len(file_list) > 1:  # Fájlok közötti duplikátum
-            updated_file_list = []
-            for filename in file_list:
-                if inter_file_deleted_counts[filename] > 0:
-                    updated_file_list.append(f"{filename} -> Törölve {inter_file_deleted_counts[filename]} sor")
-                else:
-                    updated_file_list.append(filename)
-            modified_duplicates_data[prefix] = updated_file_list
-        else:  # Fájlon belüli duplikátum - frissítjük a meglévő bejegyzést
-            filename = file_list[0]
-            if intra_file_deleted_counts[filename] > 0:
-                modified_duplicates_data[prefix] = [f"{filename} -> Törölve {intra_file_deleted_counts[filename]} sor"]
-    
-    # 4. ÚJ FÁJLON BELÜLI DUPLIKÁTUMOK HOZZÁADÁSA (csak azok, amelyek még nem szerepelnek)
-    # Azok a fájlok, amelyeknek van fájlon belüli duplikátuma, de még nem szerepelnek a kimenetben
-    for filename, deleted_count in intra_file_deleted_counts.items():
-        if deleted_count > 0:
-            # Ellenőrizzük, hogy ez a fájl már szerepel-e valamelyik duplikátumban
-            already_listed = False
-            for file_list in modified_duplicates_data.values():
-                for listed_file in file_list:
-                    # Eltávolítjuk a " -> Törölve X sor" részt az összehasonlításhoz
-                    clean_filename = listed_file.split(' ->')[0]
-                    if clean_filename == filename:
-                        already_listed = True
-                        break
-                if already_listed:
-                    break
-            
-            # Ha még nem szerepel, akkor hozzáadjuk
-            if not already_listed:
-                # Dummy prefix a fájlon belüli duplikátumokhoz
-                dummy_prefix = f"(Csak fájlon belüli duplikátumok - {filename})"
-                modified_duplicates_data[dummy_prefix] = [f"{filename} -> Törölve {deleted_count} sor"]
+            inter_deleted, intra_deleted = result
+            if inter_deleted > 0:
+                inter_file_deleted_counts[file_path.name] += inter_deleted
+            if intra_deleted > 0:
+                intra_file_deleted_counts[file_path.name] = intra_deleted
+            if inter_deleted or intra_deleted:
+                logger.info("Sikeresen törölve %d sor a(z) '%s' fájlból.", inter_deleted + intra_deleted, file_path.name)
+    finally:
+        shm.close()
+        shm.unlink()
     
     # Összegzés naplózása
     total_inter_deleted = sum(inter_file_deleted_counts.values())
@@ -517,294 +951,414 @@ def delete_duplicate_rows(files: List[Path], lines_to_delete: Dict[str, Dict[str
     logger.info(f"Fájlon belüli duplikátumok: {total_intra_deleted} sor törölve {len(intra_file_deleted_counts)} fájlból.")
     logger.info(f"Összesen: {total_deleted} sor törölve.")
     
-    return modified_duplicates_data
-
-def delete_rows_from_file(file_path: Path, lines_to_remove: List[str], logger: logging.Logger) -> bool:
-    """
-    Biztonságosan törli a megadott sorokat egy fájlból.
-    Ideiglenes fájlt használ a biztonságos módosításhoz.
-    """
-    try:
-        # Set létrehozása a gyors kereséshez
-        lines_to_remove_set = set(lines_to_remove)
-        
-        # Ideiglenes fájl létrehozása
-        with tempfile.NamedTemporaryFile(mode='w', encoding='utf-8', delete=False, suffix='.tmp') as temp_file:
-            temp_path = Path(temp_file.name)
-            
-            # Eredeti fájl olvasása és szűrt tartalom írása
-            with file_path.open('r', encoding='utf-8', errors='ignore') as original_file:
-                # Fejléc megtartása
-                header = next(original_file, None)
-                if header:
-                    temp_file.write(header)
-                
-                # Sorok szűrése
-                for line in original_file:
-                    stripped_line = line.strip()
-                    if stripped_line not in lines_to_remove_set:
-                        temp_file.write(line)
-        
-        # Eredeti fájl biztonsági mentése
-        backup_path = file_path.with_suffix(file_path.suffix + '.backup')
-        shutil.copy2(file_path, backup_path)
-        
-        # Ideiglenes fájl áthelyezése az eredeti helyre
-        shutil.move(str(temp_path), str(file_path))
-        
-        # Biztonsági mentés törlése (opcionális, megjegyzésbe tehető)
-        backup_path.unlink()
-        
-        logger.info(f"Sikeresen törölve {len(lines_to_remove)} sor a(z) '{file_path.name}' fájlból.")
-        return True
-        
-    except Exception as e:
-        logger.error(f"Hiba a sorok törlése közben a(z) '{file_path.name}' fájlban: {e}")
-        # Takarítás hiba esetén
-        if 'temp_path' in locals() and temp_path.exists():
-            temp_path.unlink()
-        return False
+    return inter_file_deleted_counts, intra_file_deleted_counts
 
 # --- Worker Függvények ---
 
-def process_file_fast(file_path: Path, file_id: int, config: Dict[str, Any]) -> Dict[str, Tuple[str, int]]:
+def process_file_fast(file_path: Path, file_id: int) -> Dict[int, Tuple[str, int]]:
     """
     'fast' stratégia worker függvénye. Egyetlen fájlt dolgoz fel.
     Visszaad egy szótárat, ahol a kulcs a hash, az érték pedig egy (prefix, darabszám) tuple.
     """
-    local_hashes = {}  # Az adott fájlon belüli hash-eket tárolja
-    with file_path.open('r', encoding='utf-8', errors='ignore') as f:
-        next(f, None)  # Fejléc átugrása
-        for line in f:
-            stripped_line = line.strip()
-            if not stripped_line: continue  # Üres sorok kihagyása
-            
-            # Sor normalizálása és hash-elése
-            normalized = normalize_line(stripped_line, config['hash_delimiter'], config['hash_fields'])
-            h = hash_normalized_line(normalized)
-            
-            # Ha a hash új, eltároljuk a prefix-szel és 1-es darabszámmal
-            if h not in local_hashes:
-                local_hashes[h] = [stripped_line[:config['write_length']], 1]
-            else:
-                # Ha már létezik, növeljük a darabszámot
-                local_hashes[h][1] += 1
+    config = _WORKER_CONFIG  # A pool indításakor kapott beállítások
+    hash_line = make_line_hasher(config)  # Normalizálás + hash-elés közvetlenül a bájtos sorokon
+    write_length = config['write_length']  # A ciklusban használt beállítás helyi névhez kötve
+    # Két lapos szótár hash-enkénti [prefix, darabszám] lista helyett: a legtöbb hash csak egyszer
+    # fordul elő, így ezekhez nem jön létre külön lista objektum, és a darabszám-szótár kicsi marad
+    first_prefixes = {}  # Hash -> az első előfordulás prefixe
+    repeat_counts = {}  # Csak a többször előforduló hash-ek -> darabszám
+    # A fejlécet az olvasó ugorja át; a következő blokkot egy háttérszál olvassa elő
+    for line in iter_file_lines(file_path):
+        stripped_line = line.strip()
+        if not stripped_line: continue  # Üres sorok kihagyása
+        
+        # Sor normalizálása és hash-elése
+        h = hash_line(stripped_line)
+        
+        # Ha a hash új, eltároljuk a prefixét; ha már létezik, növeljük a darabszámát
+        if h not in first_prefixes:
+            first_prefixes[h] = decode_prefix(stripped_line, write_length)
+        else:
+            repeat_counts[h] = repeat_counts.get(h, 1) + 1
     
     # A végső szótár összeállítása a feldolgozott adatokból
-    return {h: (data[0], data[1]) for h, data in local_hashes.items()}
+    get_count = repeat_counts.get
+    return {h: (prefix, get_count(h, 1)) for h, prefix in first_prefixes.items()}
 
-def process_file_safe_pass1(file_path: Path, config: Dict[str, Any]) -> Counter:
+def process_file_safe_pass1(file_path: Path, start: int = 0, end: int = None) -> Tuple[array, array]:
     """
     'safe' stratégia első fázisának worker függvénye.
-    Csak a hash-eket és azok előfordulási számát gyűjti össze egy fájlban.
+    A fájl (vagy a fájl egy [start, end) szeletének) egyedi hash-eit adja vissza két tömör tömbben:
+    az egyszer és a többször előfordulókat. A fejlécet csak a fájl eleji szelet ugorja át.
     """
+    config = _WORKER_CONFIG  # A pool indításakor kapott beállítások
+    hash_line = make_line_hasher(config)  # Normalizálás + hash-elés közvetlenül a bájtos sorokon
     local_hashes = Counter()  # Counter objektum a hatékony számláláshoz
-    with file_path.open('r', encoding='utf-8', errors='ignore') as f:
-        next(f, None)  # Fejléc átugrása
-        for line in f:
-            stripped_line = line.strip()
-            if stripped_line:
-                normalized = normalize_line(stripped_line, config['hash_delimiter'], config['hash_fields'])
-                local_hashes[hash_normalized_line(normalized)] += 1
-    return local_hashes
-
-def process_file_safe_pass2(file_path: Path, duplicate_hashes: Set[str], config: Dict[str, Any]) -> Dict[str, str]:
+    for lines in iter_line_blocks(file_path, start == 0, start, end):
+        # Blokkonként egyetlen update hívás: a számlálás a Counter C-szintű ciklusában fut,
+        # a strip és az üres sorok kiszűrése pedig map/filter segítségével
+        local_hashes.update(map(hash_line, filter(None, map(bytes.strip, lines))))
+    # A darabszámokra a koordinátornak nincs szüksége, csak arra, hogy egy hash ismétlődik-e
+    once = array('Q', [h for h, count in local_hashes.items() if count == 1])
+    repeated = array('Q', [h for h, count in local_hashes.items() if count > 1])
+    return once, repeated
+
+def process_file_safe_pass2(file_path: Path, file_id: int, prefix_path: Path, shm_name: str, mask: int) -> Tuple[Path, array, array]:
     """
     'safe' stratégia második fázisának worker függvénye.
-    Csak a duplikáltnak talált hash-ekhez tartozó sor-prefixeket gyűjti ki.
+    Csak az előszűrőben ütközőnek jelölt résekbe eső sorokat dolgozza fel: ezek prefixét és
+    pontos darabszámát gyűjti ki. A többi sor biztosan egyedi, így kimarad.
+    Az ütköző rések bitképét a megosztott memóriablokkból olvassa (shm_name), nem kapja meg másolatban.
+    A prefixeket nem küldi vissza: a 'disk' mód rekordformátumában a prefix_path fájlba írja őket.
+    Visszaadja a prefixfájl útvonalát, valamint a jelölt hash-eket és pontos darabszámaikat
+    ugyanabban a sorrendben, tömör array('Q') és array('I') tömbökben.
     """
-    results = {}
-    if not duplicate_hashes: return results  # Ha nincsenek duplikátumok, nincs teendő
-    with file_path.open('r', encoding='utf-8', errors='ignore') as f:
-        next(f, None)  # Fejléc átugrása
-        for line in f:
+    config = _WORKER_CONFIG  # A pool indításakor kapott beállítások
+    hash_line = make_line_hasher(config)  # Normalizálás + hash-elés közvetlenül a bájtos sorokon
+    write_length = config['write_length']  # A ciklusban használt beállítás helyi névhez kötve
+    first_prefixes = {}  # Jelölt hash -> az első előfordulás prefixe (UTF-8 bájtok)
+    repeat_counts = {}  # Csak a többször előforduló jelölt hash-ek -> darabszám
+    sketch_shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        collided = sketch_shm.buf
+        for line in iter_file_lines(file_path):
             stripped_line = line.strip()
             if not stripped_line: continue
-            normalized = normalize_line(stripped_line, config['hash_delimiter'], config['hash_fields'])
-            h = hash_normalized_line(normalized)
-            # Csak akkor dolgozzuk fel, ha a hash a duplikáltak között van
-            if h in duplicate_hashes and h not in results:
-                results[h] = stripped_line[:config['write_length']]
-    return results
-
-def process_and_sort_chunk_disk(file_info: Tuple[Path, int, Path, Dict[str, Any]]) -> List[Path]:
+            h = hash_line(stripped_line)
+            slot = h & mask
+            # Ha a hash rése nem ütköző, a sor biztosan egyedi
+            if not collided[slot >> 3] >> (slot & 7) & 1:
+                continue
+            if h not in first_prefixes:
+                first_prefixes[h] = encode_prefix(stripped_line, write_length)
+            else:
+                repeat_counts[h] = repeat_counts.get(h, 1) + 1
+    finally:
+        sketch_shm.close()
+    with open_disk_records(prefix_path, 'wb') as f_out:
+        write_disk_records(f_out, [(h, file_id, prefix) for h, prefix in first_prefixes.items()],
+                           DISK_RECORD_STRUCTS[config['hash_bits']])
+    get_count = repeat_counts.get
+    return prefix_path, array('Q', first_prefixes), array('I', [get_count(h, 1) for h in first_prefixes])
+
+def process_and_sort_chunk_disk(file_info: Tuple[Path, int, Path]) -> List[Path]:
     """
     'disk' stratégia worker függvénye. Egy fájlt darabokban (chunk) olvas be,
     feldolgozza, rendezi a darabokat hash szerint, és ideiglenes fájlokba írja őket.
     """
-    file_path, file_id, temp_dir, config = file_info
+    file_path, file_id, temp_dir = file_info
+    config = _WORKER_CONFIG  # A pool indításakor kapott beállítások
+    # Normalizálás és hash-elés külön lépésben (ugyanazzal az eredménnyel, mint a make_line_hasher),
+    # mert a 'disk' mód kihagyja az üres normalizált kulcsú sorokat
+    normalize = make_normalizer(config['hash_delimiter'].encode('utf-8'), config['hash_fields'])
+    hash_function = HASH_FUNCTIONS[config['hash_bits']]
     chunk_files = []  # Az ehhez a fájlhoz tartozó ideiglenes chunk fájlok listája
-    chunk_size_bytes = DISK_CHUNK_SIZE_MB * 1024 * 1024
+    # Egy darab ennyi előolvasott blokkból áll (a blokkokat háttérszál olvassa be)
+    blocks_per_chunk = max(1, DISK_CHUNK_SIZE_MB * 1024 * 1024 // READ_BLOCK_SIZE)
+    record_struct = DISK_RECORD_STRUCTS[config['hash_bits']]
+    write_length = config['write_length']  # A ciklusban használt beállítás helyi névhez kötve
     
     try:
-        with file_path.open('r', encoding='utf-8', errors='ignore') as f_in:
-            next(f_in, None)  # Fejléc átugrása
-            chunk_idx = 0
-            while True:
-                lines = f_in.readlines(chunk_size_bytes)  # Beolvas egy darabot
-                if not lines:
-                    break  # Fájl vége
-                
-                processed_lines = []
-                for line in lines:
-                    stripped_line = line.strip()
-                    if not stripped_line: continue
-                    
-                    prefix = stripped_line[:config['write_length']].replace(DISK_MODE_DELIMITER, " ")
-                    normalized = normalize_line(stripped_line, config['hash_delimiter'], config['hash_fields'])
-                    if not normalized: continue
-                    
-                    h = hash_normalized_line(normalized)
-                    processed_lines.append((h, file_id, prefix))
-                
-                # A darabon belüli sorok rendezése hash szerint
-                processed_lines.sort(key=lambda x: x[0])
-                
-                # A rendezett darab kiírása egy ideiglenes fájlba
-                temp_chunk_path = temp_dir / f"hashes_{file_id}_chunk_{chunk_idx}.tmp"
-                with temp_chunk_path.open('w', encoding='utf-8') as f_out:
-                    f_out.writelines(f"{h}{DISK_MODE_DELIMITER}{fid}{DISK_MODE_DELIMITER}{pref}\n" for h, fid, pref in processed_lines)
+        block_iter = iter_line_blocks(file_path)  # A fejlécet az olvasó ugorja át
+        chunk_idx = 0
+        while True:
+            lines = list(itertools.chain.from_iterable(itertools.islice(block_iter, blocks_per_chunk)))  # Beolvas egy darabot
+            if not lines:
+                break  # Fájl vége
+            
+            processed_lines = []
+            append = processed_lines.append
+            for line in lines:
+                stripped_line = line.strip()
+                if not stripped_line: continue
+                normalized = normalize(stripped_line)
+                if not normalized: continue  # Üres kulcsú sor (pl. ';x' -hf 1 mellett): nem duplikátumjelölt
                 
-                chunk_files.append(temp_chunk_path)
-                chunk_idx += 1
+                append((hash_function(normalized), file_id, encode_prefix(stripped_line, write_length)))
+            
+            # A darabon belüli sorok rendezése hash szerint (C-szintű kulcsfüggvénnyel; a teljes
+            # tuple-ök összehasonlítása lassabb lenne, mint az egész kulcsoké)
+            processed_lines.sort(key=operator.itemgetter(0))
+            
+            # A rendezett darab kiírása egy ideiglenes (bináris) fájlba
+            temp_chunk_path = temp_dir / f"hashes_{file_id}_chunk_{chunk_idx}{DISK_TEMP_SUFFIX}"
+            with open_disk_records(temp_chunk_path, 'wb') as f_out:
+                write_disk_records(f_out, processed_lines, record_struct)
+            
+            chunk_files.append(temp_chunk_path)
+            chunk_idx += 1
     except Exception as e:
         # Hiba naplózása, de a már létrehozott chunk fájlokkal visszatérünk
         logging.error(f"Error processing chunk for {file_path.name}: {e}")
 
     return chunk_files
 
+def merge_two_sorted(left: Iterator, right: Iterator) -> Iterator:
+    """
+    Két rendezett iterátor összefésülése kupac nélkül: két elem közvetlen összehasonlítása
+    olcsóbb, mint a heapq.merge kupackezelése. Egyenlő elemeknél a bal oldali kerül előre
+    (mint a heapq.merge-nél).
+    """
+    left_item, right_item = next(left, None), next(right, None)
+    while left_item is not None and right_item is not None:
+        if right_item < left_item:
+            yield right_item
+            right_item = next(right, None)
+        else:
+            yield left_item
+            left_item = next(left, None)
+    # Az egyik oldal elfogyott: a másik maradéka változatlanul továbbadható
+    if left_item is not None:
+        yield left_item
+        yield from left
+    elif right_item is not None:
+        yield right_item
+        yield from right
+
+def iter_merged_disk_records(files_to_merge: List[Path], record_struct: struct.Struct, prefix_width: int) -> Iterator[bytes]:
+    """
+    Rendezett ideiglenes fájlok nyers rekordjait fésüli össze egyetlen rendezett folyammá,
+    prefix_width bájtos prefixmezőre kiegészítve.
+    A nyers rekordok big-endian fejléce miatt a bytes összehasonlítás (memcmp) hash szerint
+    rendez, így nincs szükség kicsomagolásra és tuple-ökre.
+    """
+    # A pufferek együttes mérete fájlszámtól függetlenül legfeljebb kb. MERGE_PREFETCH_BUDGET_BYTES
+    buffer_size = max(MERGE_PREFETCH_MIN_BYTES,
+                      min(MERGE_PREFETCH_BYTES, MERGE_PREFETCH_BUDGET_BYTES // max(1, len(files_to_merge))))
+    record_iters = [iter_disk_records(f, record_struct, raw_width=prefix_width, buffer_size=buffer_size)
+                    for f in files_to_merge]
+    try:
+        if len(record_iters) == 2:
+            yield from merge_two_sorted(*record_iters)
+        else:
+            yield from heapq.merge(*record_iters)
+    finally:
+        for records in record_iters:
+            records.close()  # A generátorok lezárják a nyitott fájljaikat
+
+def merge_disk_files(files_to_merge: List[Path], output_path: Path) -> Path:
+    """
+    'disk' stratégia összefésülő worker függvénye: egy listányi rendezett ideiglenes fájlt
+    fésül össze egyetlen rendezett kimeneti fájlba. Egy szint csoportjai párhuzamosan futnak.
+    """
+    if len(files_to_merge) == 1:
+        # Egyetlen, már rendezett fájl: átnevezés elég, nincs mit összefésülni
+        files_to_merge[0].replace(output_path)
+        return output_path
+    record_struct = DISK_RECORD_STRUCTS[_WORKER_CONFIG['hash_bits']]
+    prefix_width = max(map(read_disk_prefix_width, files_to_merge))  # A kimenet prefixmezője
+    merged_raw_records = iter_merged_disk_records(files_to_merge, record_struct, prefix_width)
+    try:
+        with open_disk_records(output_path, 'wb') as f_out:
+            f_out.write(DISK_FILE_HEADER.pack(prefix_width))
+            # A rekordokat adagonként, egyetlen join + write hívással írjuk ki
+            while True:
+                batch = b''.join(itertools.islice(merged_raw_records, MERGE_WRITE_BATCH))
+                if not batch:
+                    break
+                f_out.write(batch)
+    finally:
+        merged_raw_records.close()
+    return output_path
+
+def get_merge_batch_size(file_count: int, config: Dict[str, Any]) -> int:
+    """
+    Az egyszerre összefésülendő fájlok száma. Ha nincs megadva (-mbs), több workerrel kb. a fájlszám
+    négyzetgyöke: így az első szint csoportjai párhuzamosan futnak, és két szint elég. Egy workerrel
+    a párhuzamosításból nincs nyereség, ezért egyetlen szinten fésülünk össze, amennyit lehet.
+    """
+    if config.get('merge_batch_size'):
+        return max(2, config['merge_batch_size'])
+    if MAX_WORKERS > 1:
+        # Legfeljebb egy ideiglenes fájlnál (pl. csak fejlécet tartalmazó bemenet) nincs mit összefésülni
+        return min(MERGE_BATCH_SIZE_MAX, max(2, math.isqrt(max(file_count - 1, 0)) + 1))
+    return MERGE_BATCH_SIZE_MAX
+
 # --- FRISSÍTETT Stratégia Vezérlő Függvények ---
 
-def run_strategy_fast(files: List[Path], id_to_file_map: Dict[int, str], config: Dict[str, Any], logger: logging.Logger, file_only_logger: logging.Logger):
+def finalize_duplicates(files: List[Path], writer: DuplicatesWriter, inter_file_hashes: Dict[int, Iterable[int]], config: Dict[str, Any], logger: logging.Logger, executor: ProcessPoolExecutor):
+    """
+    A három stratégia közös befejező lépése. Ha a duplikátumtörlés engedélyezve van,
+    törli a duplikált sorokat a fájlokból, majd lezárja a kimenetet (a writer ekkor írja ki).
+    Az inter_file_hashes a több fájlban előforduló hash-ek {hash: [fájl ID-k]} hozzárendelése
+    (csak duplikátumtörléskor van rá szükség).
+    """
+    inter_deleted_counts = intra_deleted_counts = None
+    if config.get('deleteduplicates', False):
+        hashes_to_delete = plan_inter_file_deletions(files, inter_file_hashes, logger)
+        inter_deleted_counts, intra_deleted_counts = delete_duplicate_rows(files, hashes_to_delete, logger, executor)
+        # Azok a fájlok, amelyeknek volt fájlon belüli duplikátuma, de még nem szerepelnek a kimenetben
+        for filename, deleted_count in intra_deleted_counts.items():
+            if deleted_count > 0 and filename not in writer.listed_names:
+                # Dummy prefix a fájlon belüli duplikátumokhoz
+                writer.write(f"(Csak fájlon belüli duplikátumok - {filename})", [filename])
+
+    writer.close(inter_deleted_counts, intra_deleted_counts)
+
+def reset_temp_dir():
+    """Üres ideiglenes könyvtárat készít: egy korábbi futás esetleges maradékát egyben törli."""
+    if TEMP_DIR.exists():
+        shutil.rmtree(TEMP_DIR)
+    TEMP_DIR.mkdir(parents=True, exist_ok=True)
+
+def remove_temp_dir(logger: logging.Logger):
+    """Törli az ideiglenes könyvtárat a tartalmával együtt (fájlonkénti nyilvántartás nélkül)."""
+    logger.info("Ideiglenes fájlok törlése...")
+    shutil.rmtree(TEMP_DIR, ignore_errors=True)
+    if TEMP_DIR.exists():
+        logger.warning(f"Nem sikerült minden ideiglenes fájlt törölni: {TEMP_DIR}")
+
+def run_strategy_fast(files: List[Path], file_names: List[str], config: Dict[str, Any], logger: logging.Logger, file_only_logger: logging.Logger, executor: ProcessPoolExecutor):
     """
     'fast' stratégia végrehajtása.
     Minden fájlt párhuzamosan feldolgoz, és az eredményeket a memóriában egyesíti.
     """
     logger.info("--- Indítás: FAST (memóriaigényes) stratégia ---")
-    # Globális szótár a hash-ek, prefixek és fájl-számlálók tárolására
-    global_hashes = defaultdict(lambda: ("", Counter()))
-
-    # ProcessPoolExecutor a párhuzamos végrehajtáshoz
-    with ProcessPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        # Feladatok beküldése a workereknek
-        future_to_id = {executor.submit(process_file_fast, path, fid, config): fid for fid, path in enumerate(files)}
-        # Eredmények begyűjtése, amint elkészülnek (progress bar-ral)
-        for future in tqdm(as_completed(future_to_id), total=len(future_to_id), desc="FAST feldolgozás"):
-            file_id = future_to_id[future]
-            try:
-                partial_results = future.result()  # Worker eredményének lekérése
-                # Részeredmények egyesítése a globális szótárba
-                for h, (prefix, count) in partial_results.items():
-                    if not global_hashes[h][0]:
-                        global_hashes[h] = (prefix, global_hashes[h][1])
-                    global_hashes[h][1][file_id] = count
-                file_only_logger.info(f"Feldolgozva: {id_to_file_map[file_id]}")
-            except Exception as e:
-                logger.error(f"Hiba a(z) '{id_to_file_map[file_id]}' feldolgozása közben: {e}", exc_info=True)
-
-    # Kimeneti adatok előkészítése a duplikátumokból
-    output_data = {}
+    # Lapos globális szótár: hash -> (prefix, első fájl ID, darabszám az első fájlban).
+    # A hash-ek túlnyomó többsége csak egy fájlban fordul elő, ezért hash-enként
+    # nem hozunk létre külön Counter objektumot.
+    hash_first_seen = {}
+    # Csak a több fájlban is előforduló hash-ekhez: hash -> további fájl ID-k
+    hash_extra_files = defaultdict(list)
+
+    memory_warned = False  # A magas memóriahasználatra csak egyszer figyelmeztetünk
+    # Feladatok kötegelt beküldése a workereknek; az eredményeket elkészülési sorrendben egyesítjük
+    results = map_tasks(executor, process_file_fast, [(path, fid) for fid, path in enumerate(files)])
+    for completed, (file_id, partial_results, error) in enumerate(tqdm(results, total=len(files), desc="FAST feldolgozás", mininterval=PROGRESS_MININTERVAL), 1):
+        # A globális szótár a fájlokkal együtt nő: időnként ellenőrizzük a memóriahasználatot
+        if not memory_warned and completed % MEMORY_CHECK_INTERVAL == 0:
+            memory_warned = check_memory_pressure(logger)
+        if error:
+            logger.error(f"Hiba a(z) '{file_names[file_id]}' feldolgozása közben:\n{error}")
+            continue
+        # Részeredmények egyesítése: rekordonként egyetlen setdefault hívás
+        setdefault = hash_first_seen.setdefault
+        for h, (prefix, count) in partial_results.items():
+            if setdefault(h, (prefix, file_id, count))[1] != file_id:
+                hash_extra_files[h].append(file_id)
+        file_only_logger.info("Feldolgozva: %s", file_names[file_id])
+
+    # Kimeneti bejegyzések átadása a writernek
+    writer = DuplicatesWriter(DEFAULT_OUTPUT_FILE, logger)
     intra_file_duplicates = {}
     
-    for _, (prefix, file_counts) in global_hashes.items():
-        total_occurrences = sum(file_counts.values())
-        
-        # Fájlok közötti duplikátumok (több fájlban előfordul)
-        if len(file_counts) > 1:
-            file_ids = file_counts.keys()
-            output_data[prefix] = [id_to_file_map[fid] for fid in sorted(list(file_ids))]
+    for h, (prefix, first_id, count) in hash_first_seen.items():
+        extra_ids = hash_extra_files.get(h)
+        # Fájlok közötti duplikátumok (több fájlban előfordul). A fájlneveket a writer rendezi
+        # kiíráskor, ezért a fájl ID-ket itt nem kell sorba rakni.
+        if extra_ids:
+            writer.write(prefix, [file_names[fid] for fid in (first_id, *extra_ids)])
         # Fájlon belüli duplikátumok (egy fájlban, de többször)
-        elif total_occurrences > 1:
-            file_id = list(file_counts.keys())[0]
-            filename = id_to_file_map[file_id]
-            intra_file_duplicates[prefix] = [filename]
-
-    # Fájlon belüli duplikátumok hozzáadása a kimenethez
-    output_data.update(intra_file_duplicates)
+        elif count > 1:
+            intra_file_duplicates[prefix] = [file_names[first_id]]
 
-    # Duplikátumtörlés végrehajtása, ha engedélyezve van
-    if config.get('deleteduplicates', False):
-        lines_to_delete = collect_duplicate_lines_for_deletion(files, output_data, config, logger)
-        output_data = delete_duplicate_rows(files, lines_to_delete, output_data, config, logger)
+    # Fájlon belüli duplikátumok hozzáadása a kimenethez (azonos prefixnél ezek az érvényesek)
+    for prefix, names in intra_file_duplicates.items():
+        writer.write(prefix, names)
 
-    # Duplikátumok kiírása fájlba
-    write_duplicates(output_data, DEFAULT_OUTPUT_FILE, logger)
+    # Duplikátumtörlés (ha engedélyezve van) és kiírás fájlba
+    inter_file_hashes = {h: [hash_first_seen[h][1], *extra_ids] for h, extra_ids in hash_extra_files.items()}
+    finalize_duplicates(files, writer, inter_file_hashes, config, logger, executor)
 
-def run_strategy_safe(files: List[Path], id_to_file_map: Dict[int, str], config: Dict[str, Any], logger: logging.Logger, file_only_logger: logging.Logger):
+def run_strategy_safe(files: List[Path], file_names: List[str], config: Dict[str, Any], logger: logging.Logger, file_only_logger: logging.Logger, executor: ProcessPoolExecutor):
     """
     'safe' stratégia végrehajtása. Két fázisban dolgozik a memóriaterhelés csökkentése érdekében.
-    1. Fázis: Csak a hash-eket és azok darabszámát gyűjti.
-    2. Fázis: Csak a duplikált hash-ekhez tartozó sor-prefixeket gyűjti be.
+    1. Fázis: A hash-ekből egy kétbites előszűrőt (látott / ütköző rések bitképe) épít.
+    2. Fázis: Csak az ütköző résekbe eső sorok prefixét és pontos darabszámát gyűjti be.
     """
     logger.info("--- Indítás: SAFE (memóriakímélő) stratégia ---")
     
-    # --- 1. FÁZIS: Hash-ek és előfordulásaik gyűjtése ---
-    logger.info("--- 1. FÁZIS: Hash-ek és előfordulásaik gyűjtése ---")
-    hash_to_file_counts = defaultdict(Counter)
-
-    with ProcessPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        future_to_id = {executor.submit(process_file_safe_pass1, path, config): fid for fid, path in enumerate(files)}
-        for future in tqdm(as_completed(future_to_id), total=len(future_to_id), desc="SAFE 1. fázis"):
-            file_id = future_to_id[future]
-            try:
-                hashes_with_counts = future.result()
-                for h, count in hashes_with_counts.items():
+    try:
+        # --- 1. FÁZIS: Előszűrő építése a hash-ekből ---
+        logger.info("--- 1. FÁZIS: Előszűrő építése a hash-ekből ---")
+        # A koordinátor hash-enkénti adatok helyett csak két bitképet tart a memóriában
+        mask = make_sketch_mask(files)
+        seen = bytearray((mask + 1) // 8 or 1)
+        # Az ütköző rések bitképe közvetlenül megosztott memóriában készül: a második fázis workerei
+        # ugyanezt az egy példányt olvassák
+        sketch_shm = shared_memory.SharedMemory(create=True, size=len(seen))
+        try:
+            collided = sketch_shm.buf
+
+            # A nagy fájlokat sorhatárra igazított szeletekben dolgozzuk fel, így kevés (vagy egyetlen) nagy
+            # fájl is kihasználja az összes workert. Az előszűrőhöz nem kell tudni, melyik szeletből jön egy
+            # hash: a több szeletben is előforduló hash rése a 'seen' bit miatt ütközőnek jelölődik.
+            range_size = SAFE_PASS1_RANGE_MB * 1024 * 1024
+            tasks = [(fid, start, end) for fid, path in enumerate(files) for start, end in split_file_ranges(path, range_size)]
+            results = map_tasks(executor, process_file_safe_pass1, [(files[fid], start, end) for fid, start, end in tasks])
+            for index, result, error in tqdm(results, total=len(tasks), desc="SAFE 1. fázis", mininterval=PROGRESS_MININTERVAL):
+                file_id, start, end = tasks[index]
+                if error:
+                    logger.error(f"Hiba (1. fázis) a(z) '{file_names[file_id]}' ({start}-{end}. bájt) feldolgozása során:\n{error}")
+                    continue
+                once, repeated = result
+                add_to_sketch(seen, collided, once, mask, False)
+                add_to_sketch(seen, collided, repeated, mask, True)
+                file_only_logger.info("[1. fázis] Feldolgozva: %s (%d-%d. bájt)", file_names[file_id], start, end)
+            del seen
+
+            # Ha egyetlen rés sem ütköző, biztosan nincs duplikátum
+            if not any(collided):
+                write_duplicates({}, DEFAULT_OUTPUT_FILE, logger)
+                return
+
+            # --- 2. FÁZIS: Duplikált sorok adatainak gyűjtése ---
+            logger.info(f"Az előszűrő {count_set_bits(collided):,} rést jelölt ütközőnek ({mask + 1:,} résből).")
+            logger.info("--- 2. FÁZIS: Duplikált sorok adatainak gyűjtése ---")
+            # A prefixek nem kerülnek a koordinátor memóriájába: a workerek fájlonként egy ideiglenes
+            # rekordfájlba írják őket, ezeket csak a kimenet írásakor olvassuk végig
+            reset_temp_dir()
+            # Fájlonként a jelölt hash-ek és pontos darabszámaik párhuzamos, tömör tömbökben
+            # (jelöltenként 12 bájt; egy (hash, fájl ID) kulcsú szótár bejegyzésenként egy tuple-t is tartana)
+            candidates = []  # (fájl ID, array('Q') hash-ek, array('I') darabszámok)
+            files_per_hash = Counter()  # Hash -> hány fájlban fordul elő
+            prefix_files = []  # A sikeresen feldolgozott fájlok (fájl ID, prefixfájl) párjai
+            # A workerek csak a megosztott blokk nevét kapják meg, a bitképet nem kell feladatonként pickle-elni
+            task_args = [(path, fid, TEMP_DIR / f"prefixes_{fid}{DISK_TEMP_SUFFIX}", sketch_shm.name, mask) for fid, path in enumerate(files)]
+            results = map_tasks(executor, process_file_safe_pass2, task_args)
+            for file_id, result, error in tqdm(results, total=len(files), desc="SAFE 2. fázis", mininterval=PROGRESS_MININTERVAL):
+                if error:
+                    logger.error(f"Hiba (2. fázis) a(z) '{file_names[file_id]}' feldolgozása során:\n{error}")
+                    continue
+                # Egy hash fájlonként egyszer szerepel, így a fájlszámlálás egy C-szintű update hívás
+                prefix_path, hashes, counts = result
+                prefix_files.append((file_id, prefix_path))
+                files_per_hash.update(hashes)
+                candidates.append((file_id, hashes, counts))
+        finally:
+            sketch_shm.close()
+            sketch_shm.unlink()
+        
+        # A hash -> {fájl ID: darabszám} bontás csak a valódi duplikátumokra: az előszűrő álpozitív,
+        # egyszer előforduló jelöltjei itt kiesnek
+        hash_to_file_counts = defaultdict(dict)
+        for file_id, hashes, counts in candidates:
+            for h, count in zip(hashes, counts):
+                if count > 1 or files_per_hash[h] > 1:
                     hash_to_file_counts[h][file_id] = count
-                file_only_logger.info(f"[1. fázis] Feldolgozva: {id_to_file_map[file_id]}")
-            except Exception as e:
-                logger.error(f"Hiba (1. fázis) a(z) '{id_to_file_map[file_id]}' feldolgozása során: {e}", exc_info=True)
-
-    # Azon hash-ek kiválasztása, amelyek duplikátumok (fájlok között vagy fájlon belül)
-    duplicate_hashes = set()
-    for h, fc in hash_to_file_counts.items():
-        total_count = sum(fc.values())
-        file_count = len(fc)
-        # Duplikátum, ha több fájlban előfordul VAGY egy fájlban többször
-        if file_count > 1 or total_count > 1:
-            duplicate_hashes.add(h)
-    
-    if not duplicate_hashes:
-        write_duplicates({}, DEFAULT_OUTPUT_FILE, logger)
-        return
-
-    # --- 2. FÁZIS: Duplikált sorok adatainak gyűjtése ---
-    logger.info(f"Összesen {len(duplicate_hashes)} egyedi duplikált hash azonosítva.")
-    logger.info("--- 2. FÁZIS: Duplikált sorok adatainak gyűjtése ---")
-    hash_to_prefix_map = {}
-    with ProcessPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        # A második fázisban csak a duplikált hash-ek listáját adjuk át a workereknek
-        future_to_file = {executor.submit(process_file_safe_pass2, path, duplicate_hashes, config): path for path in files}
-        for future in tqdm(as_completed(future_to_file), total=len(future_to_file), desc="SAFE 2. fázis"):
-            try:
-                hash_to_prefix_map.update(future.result())
-            except Exception as e:
-                logger.error(f"Hiba (2. fázis) a(z) '{future_to_file[future].name}' feldolgozása során: {e}", exc_info=True)
-    
-    # Kimeneti adatok összeállítása a két fázis eredményeiből
-    output_data = {}
-    for h, prefix in hash_to_prefix_map.items():
-        if h in duplicate_hashes:
-            file_counts = hash_to_file_counts[h]
-            total_count = sum(file_counts.values())
-            file_count = len(file_counts)
-            
-            # Fájlok közötti duplikátum
-            if file_count > 1:
-                file_ids = file_counts.keys()
-                output_data[prefix] = [id_to_file_map[fid] for fid in sorted(list(file_ids))]
-            # Fájlon belüli duplikátum
-            elif total_count > 1:
-                file_id = list(file_counts.keys())[0]
-                output_data[prefix] = [id_to_file_map[file_id]]
-
-    # Duplikátumtörlés végrehajtása, ha engedélyezve van
-    if config.get('deleteduplicates', False):
-        lines_to_delete = collect_duplicate_lines_for_deletion(files, output_data, config, logger)
-        output_data = delete_duplicate_rows(files, lines_to_delete, output_data, config, logger)
-
-    write_duplicates(output_data, DEFAULT_OUTPUT_FILE, logger)
+        del candidates, files_per_hash
+        inter_file_hashes = {h: fc.keys() for h, fc in hash_to_file_counts.items() if len(fc) > 1}
+
+        # Kimeneti bejegyzések összeállítása a prefixfájlok végigolvasásával: minden duplikátum a
+        # legkisebb fájl ID-jű előfordulás prefixével, egyszer kerül a writerbe. Fájlon belüli
+        # duplikátumnál egyetlen fájlnév szerepel (a fenti szűrés miatt legalább két előfordulással).
+        writer = DuplicatesWriter(DEFAULT_OUTPUT_FILE, logger)
+        record_struct = DISK_RECORD_STRUCTS[config['hash_bits']]
+        pop_file_counts = hash_to_file_counts.pop
+        for _, prefix_path in sorted(prefix_files):  # Fájl ID sorrendben
+            for h, _, prefix_length, prefix_field in iter_disk_records(prefix_path, record_struct):
+                file_counts = pop_file_counts(h, None)
+                if file_counts is not None:
+                    # A fájlneveket a writer rendezi kiíráskor
+                    writer.write(prefix_field[:prefix_length].decode('utf-8', errors='ignore'), [file_names[fid] for fid in file_counts])
+
+        # Duplikátumtörlés (ha engedélyezve van) és kiírás fájlba
+        finalize_duplicates(files, writer, inter_file_hashes, config, logger, executor)
+    finally:
+        if TEMP_DIR.exists():
+            remove_temp_dir(logger)
 
-def run_strategy_disk(files: List[Path], id_to_file_map: Dict[int, str], config: Dict[str, Any], logger: logging.Logger, file_only_logger: logging.Logger):
+def run_strategy_disk(files: List[Path], file_names: List[str], config: Dict[str, Any], logger: logging.Logger, file_only_logger: logging.Logger, executor: ProcessPoolExecutor):
     """
     'disk' stratégia végrehajtása. Nagyon nagy adatmennyiséghez, külső rendezést (external sort) használ.
     1. Fázis: Minden fájlt darabokban feldolgoz, és a hash-eket rendezve ideiglenes fájlokba írja.
@@ -812,133 +1366,109 @@ def run_strategy_disk(files: List[Path], id_to_file_map: Dict[int, str], config:
     3. Fázis: A végső, rendezett fájl feldolgozása a duplikátumok azonosítására.
     """
     logger.info("--- Indítás: DISK (optimalizált diszk-alapú) stratégia ---")
-    if TEMP_DIR.exists():
-        for f in TEMP_DIR.iterdir(): f.unlink()
-    TEMP_DIR.mkdir(exist_ok=True)
+    reset_temp_dir()
 
-    all_temp_files = []
     try:
         # --- 1. FÁZIS: Adatok feldolgozása és rendezett ideiglenes fájlokba írása ---
         logger.info("--- 1. FÁZIS: Adatok feldolgozása és rendezett ideiglenes fájlokba írása (darabolva) ---")
-        with ProcessPoolExecutor(max_workers=MAX_WORKERS) as executor:
-            tasks = [(path, fid, TEMP_DIR, config) for fid, path in enumerate(files)]
-            future_to_task = {executor.submit(process_and_sort_chunk_disk, task): task for task in tasks}
-            
-            for future in tqdm(as_completed(future_to_task), total=len(future_to_task), desc="DISK 1. fázis"):
-                task_path, task_id = future_to_task[future][0], future_to_task[future][1]
-                try:
-                    chunk_files = future.result()
-                    all_temp_files.extend(chunk_files)
-                    file_only_logger.info(f"[1. fázis] Feldolgozva: {id_to_file_map[task_id]}")
-                except Exception as e:
-                    logger.error(f"Hiba a(z) '{task_path.name}' (ID: {task_id}) feldolgozása során: {e}", exc_info=True)
+        tasks = [(path, fid, TEMP_DIR) for fid, path in enumerate(files)]
+        temp_files_for_merge = []  # A rendezett ideiglenes fájlok; minden a TEMP_DIR-ben, egyben törlődik
+        results = map_tasks(executor, process_and_sort_chunk_disk, [(task,) for task in tasks])
+        
+        for index, chunk_files, error in tqdm(results, total=len(tasks), desc="DISK 1. fázis", mininterval=PROGRESS_MININTERVAL):
+            task_path, task_id, _ = tasks[index]
+            if error:
+                logger.error(f"Hiba a(z) '{task_path.name}' (ID: {task_id}) feldolgozása során:\n{error}")
+                continue
+            temp_files_for_merge.extend(chunk_files)
+            file_only_logger.info("[1. fázis] Feldolgozva: %s", file_names[task_id])
 
         # --- 2. FÁZIS: Lépcsőzetes összefésülés (Cascading Merge) ---
         logger.info("--- 2. FÁZIS: Lépcsőzetes összefésülés (Cascading Merge) ---")
         
-        def merge_files(files_to_merge: List[Path], output_path: Path):
-            """Segédfüggvény, amely összefésül egy listányi fájlt egyetlen kimeneti fájlba."""
-            open_files_list = []
-            try:
-                for f in files_to_merge:
-                    open_files_list.append(f.open('r', encoding='utf-8'))
-                
-                with output_path.open('w', encoding='utf-8') as f_out:
-                    merged_lines = heapq.merge(*open_files_list)
-                    f_out.writelines(merged_lines)
-            finally:
-                for f in open_files_list:
-                    f.close()
+        record_struct = DISK_RECORD_STRUCTS[config['hash_bits']]
+        merge_batch_size = get_merge_batch_size(len(temp_files_for_merge), config)
+        logger.info(f"Összefésülési csoportméret: {merge_batch_size} fájl")
 
         merge_level = 0
-        temp_files_for_merge = all_temp_files.copy() # Másolatot használunk, hogy az eredeti lista megmaradjon a takarításhoz
-        while len(temp_files_for_merge) > 1:
+        # Az utolsó szintet (legfeljebb merge_batch_size fájl) nem írjuk ki: azt a 3. fázis
+        # közvetlenül az összefésült folyamon dolgozza fel, így elmarad egy teljes írás és visszaolvasás
+        while len(temp_files_for_merge) > merge_batch_size:
             merge_level += 1
             logger.info(f"Összefésülési szint {merge_level}, {len(temp_files_for_merge)} fájl feldolgozása...")
-            merged_level_files = []
-            
-            for i in tqdm(range(0, len(temp_files_for_merge), config['merge_batch_size']), desc=f"Összefésülés szint {merge_level}"):
-                batch = temp_files_for_merge[i:i + config['merge_batch_size']]
-                if not batch: continue
-                
-                output_path = TEMP_DIR / f"merged_{merge_level}_{i}.tmp"
-                merge_files(batch, output_path)
-                merged_level_files.append(output_path)
-                all_temp_files.append(output_path) # Hozzáadjuk a takarítandó fájlok listájához
-
-            temp_files_for_merge = merged_level_files
-
-        final_merged_file = temp_files_for_merge[0] if temp_files_for_merge else None
-
-        # --- 3. FÁZIS: Duplikátumok keresése a végső összefésült fájlban ---
-        logger.info("--- 3. FÁZIS: Duplikátumok keresése a végső összefésült fájlban ---")
-        output_data = {}
-        if final_merged_file and final_merged_file.exists():
-            with final_merged_file.open('r', encoding='utf-8') as f:
-                line_grouper = itertools.groupby(f, key=lambda line: line.split(DISK_MODE_DELIMITER, 1)[0])
-                for h, group in tqdm(line_grouper, desc="DISK 3. fázis - Duplikátumkeresés"):
-                    group_items = list(group)
-                    if len(group_items) > 1:
-                        file_ids, prefix = set(), ""
-                        total_occurrences = len(group_items)
-                        
-                        for item in group_items:
-                            try:
-                                _, fid_str, current_prefix = item.strip().split(DISK_MODE_DELIMITER, 2)
-                                file_ids.add(int(fid_str))
-                                if not prefix: prefix = current_prefix
-                            except (ValueError, IndexError): continue
-                        
-                        if prefix:
-                            file_names = [id_to_file_map[fid] for fid in sorted(list(file_ids))]
-                            output_data[prefix] = file_names
+            batches = [temp_files_for_merge[i:i + merge_batch_size] for i in range(0, len(temp_files_for_merge), merge_batch_size)]
+            output_paths = [TEMP_DIR / f"merged_{merge_level}_{i}{DISK_TEMP_SUFFIX}" for i in range(len(batches))]
+
+            # Egy szint csoportjai egymástól függetlenek, ezért párhuzamosan fésüljük össze őket
+            merged = executor.map(merge_disk_files, batches, output_paths)
+            temp_files_for_merge = list(tqdm(merged, total=len(batches), desc=f"Összefésülés szint {merge_level}", mininterval=PROGRESS_MININTERVAL))
+
+        # --- 3. FÁZIS: Duplikátumok keresése a végső összefésülés közben ---
+        logger.info(f"--- 3. FÁZIS: Duplikátumok keresése a végső összefésülés közben ({len(temp_files_for_merge)} fájl) ---")
+        # A duplikátumok közvetlenül a writerbe kerülnek: a kimenet nem épül fel egy szótárban
+        writer = DuplicatesWriter(DEFAULT_OUTPUT_FILE, logger)
+        inter_file_hashes = {}  # Csak duplikátumtörléshez: {hash: fájl ID-k}
+        collect_hashes = config.get('deleteduplicates', False)
+        if temp_files_for_merge:
+            prefix_width = max(map(read_disk_prefix_width, temp_files_for_merge))
+            final_record = get_disk_record_struct(record_struct, prefix_width)
+            merged_raw_records = iter_merged_disk_records(temp_files_for_merge, record_struct, prefix_width)
+            # (hash, fájl ID, prefix hossza, prefixmező) tuple-ök, összefésült sorrendben
+            record_grouper = itertools.groupby(map(final_record.unpack, merged_raw_records), key=operator.itemgetter(0))
+            try:
+                for h, group in tqdm(record_grouper, desc="DISK 3. fázis - Duplikátumkeresés", miniters=PROGRESS_HOT_LOOP_MINITERS,
+                                    mininterval=PROGRESS_HOT_LOOP_MININTERVAL, disable=None):
+                    # A hash-ek túlnyomó többsége egyedi: ezekhez nem építünk listát, elég a második
+                    # rekord hiányát észrevenni
+                    first_record = next(group)
+                    second_record = next(group, None)
+                    if second_record is None:
+                        continue
+                    group_items = [first_record, second_record, *group]
+                    file_ids, prefix = set(), ""
+                    
+                    for _, fid, prefix_length, prefix_field in group_items:
+                        file_ids.add(fid)
+                        if not prefix: prefix = prefix_field[:prefix_length].decode('utf-8', errors='ignore')
+                    
+                    if prefix:
+                        writer.write(prefix, [file_names[fid] for fid in file_ids])  # A writer rendezi a neveket
+                    if collect_hashes and len(file_ids) > 1:
+                        inter_file_hashes[h] = file_ids
+            finally:
+                merged_raw_records.close()  # Lezárja az ideiglenes fájlokat a takarítás előtt
         
-        # Duplikátumtörlés végrehajtása, ha engedélyezve van
-        if config.get('deleteduplicates', False):
-            lines_to_delete = collect_duplicate_lines_for_deletion(files, output_data, config, logger)
-            output_data = delete_duplicate_rows(files, lines_to_delete, output_data, config, logger)
-
-        write_duplicates(output_data, DEFAULT_OUTPUT_FILE, logger)
+        # Duplikátumtörlés (ha engedélyezve van) és kiírás fájlba
+        finalize_duplicates(files, writer, inter_file_hashes, config, logger, executor)
 
     finally:
-        logger.info("Ideiglenes fájlok törlése...")
-        try:
-            # A finally blokkban a all_temp_files listában szereplő összes fájlt töröljük
-            for f in all_temp_files:
-                if f.exists():
-                    f.unlink()
-            if TEMP_DIR.exists():
-                TEMP_DIR.rmdir()
-        except Exception as e:
-            logger.warning(f"Nem sikerült minden ideiglenes fájlt törölni: {e}")
+        remove_temp_dir(logger)
 
 # --- Fő Vezérlés és Stratégiaválasztás ---
-def estimate_average_line_length(file: Path, logger: logging.Logger, max_lines: int = 10000) -> float:
+def estimate_average_line_length(file: Path, logger: logging.Logger, sample_bytes: int = LINE_LENGTH_SAMPLE_BYTES) -> float:
     """
-    Megbecsüli egy fájl átlagos sorhosszát egy minta alapján.
+    Megbecsüli egy fájl átlagos sorhosszát (bájtban, sorvége nélkül) egy bájtos minta alapján.
     Ez segít a 'disk' mód tárhelyigényének pontosabb becslésében.
+    A mintát egyben olvassa be, és a sorokat egyetlen bytes.count hívással számolja meg.
     """
-    total_length = 0
-    line_count = 0
     try:
-        with file.open('r', encoding='utf-8', errors='ignore') as f:
-            next(f)  # Fejléc kihagyása
-            for line in f:
-                stripped = line.strip()
-                if stripped:
-                    total_length += len(stripped)
-                    line_count += 1
-                    if line_count >= max_lines:  # Elég a minta
-                        break
+        with file.open('rb') as f:
+            size = f.seek(0, os.SEEK_END)
+            # Kis fájlnál az elejéről, nagynál a fájl belsejéből veszünk mintát
+            f.seek(0 if size <= sample_bytes else min(size // 2, sample_bytes))
+            sample = f.read(sample_bytes)
+        # Az első sor (fejléc vagy csonka sor) és a végén esetleg csonka sor levágása
+        sample = sample[sample.find(b'\n') + 1:sample.rfind(b'\n') + 1]
+        line_count = sample.count(b'\n')
         if line_count == 0:
             logger.warning(f"Nem sikerült érvényes sort találni a(z) '{file.name}' fájlban. Alapértelmezett érték lesz használva.")
             return 150.0  # Visszaad egy ésszerű alapértelmezett értéket
-        return total_length / line_count
+        return (len(sample) - line_count) / line_count
     except Exception as e:
         logger.warning(f"Hiba az átlagos sorhossz becslése közben: {e}. Alapértelmezett érték: 150.0")
         return 150.0
 
-def auto_select_strategy(files: List[Path], wlength: int, logger: logging.Logger) -> str:
+def auto_select_strategy(files: List[Path], wlength: int, logger: logging.Logger, hash_bits: int = 64) -> str:
     """
     Automatikusan kiválasztja a legmegfelelőbb stratégiát a rendelkezésre álló memória
     és a feldolgozandó adatok mérete alapján.
@@ -961,7 +1491,7 @@ def auto_select_strategy(files: List[Path], wlength: int, logger: logging.Logger
         avg_line_length = estimate_average_line_length(largest_file, logger)
 
         # 'disk' mód várható tárhelyigényének becslése
-        disk_record_length = 16 + 2 + 3 + wlength + 1  # hash + tabok + file_id + prefix + newline
+        disk_record_length = DISK_RECORD_STRUCTS[hash_bits].size + wlength  # bináris fejléc (hash, file_id, hossz) + prefixmező
         est_disk_space_bytes = int(total_size_bytes * (disk_record_length / avg_line_length))
 
         logger.info("Automatikus stratégiaválasztás:")
@@ -971,7 +1501,7 @@ def auto_select_strategy(files: List[Path], wlength: int, logger: logging.Logger
         logger.info(f"  - 'fast' mód becsült memóriaigénye: {est_fast_mode_ram / (1024**3):.3f} GB")
         logger.info(f"  - 'safe' mód becsült memóriaigénye: {est_safe_mode_ram / (1024**3):.3f} GB")
         logger.info(f"  - 'disk' mód becsült tárhelyigénye: {est_disk_space_bytes / (1024**3):.3f} GB")
-        logger.info(f"  - Átlagos sorhossz becslés a '{largest_file.name}' fájlból: {avg_line_length:.1f} karakter")
+        logger.info(f"  - Átlagos sorhossz becslés a '{largest_file.name}' fájlból: {avg_line_length:.1f} bájt")
 
         # Döntési logika
         if est_fast_mode_ram < ram_limit:
@@ -987,25 +1517,33 @@ def auto_select_strategy(files: List[Path], wlength: int, logger: logging.Logger
         logger.warning(f"Nem sikerült az automatikus stratégiaválasztás ({e}). Alapértelmezett: 'safe' mód.")
         return "safe"
 
+# A str_to_bool által elfogadott gyakori írásmódok (egyetlen halmazbeli kereséssel, kisbetűsítés nélkül)
+_TRUE_VALUES = frozenset({'true', 'True', 'TRUE', '1', 'yes', 'Yes', 'YES'})
+_FALSE_VALUES = frozenset({'false', 'False', 'FALSE', '0', 'no', 'No', 'NO'})
+
 def str_to_bool(value: str) -> bool:
     """
     Konvertál egy string értéket boolean-ná.
-    Elfogadott értékek: 'true', 'false' (kis/nagy betű érzéketlen).
+    Elfogadott értékek: 'true'/'false' (kis/nagy betű érzéketlen), valamint '1'/'0' és 'yes'/'no'.
     """
-    if value.lower() == 'true':
+    if value in _TRUE_VALUES:
         return True
-    elif value.lower() == 'false':
+    if value in _FALSE_VALUES:
         return False
-    else:
-        raise argparse.ArgumentTypeError(f"Boolean érték várható ('true' vagy 'false'), de '{value}' érkezett.")
+    # Ritka, vegyes írásmód (pl. 'tRuE'): kisbetűsítve még egyszer
+    lowered = value.lower()
+    if lowered in _TRUE_VALUES:
+        return True
+    if lowered in _FALSE_VALUES:
+        return False
+    raise argparse.ArgumentTypeError(f"Boolean érték várható ('true' vagy 'false'), de '{value}' érkezett.")
 
-def main():
+@functools.lru_cache(maxsize=None)
+def _build_parser() -> argparse.ArgumentParser:
     """
-    A program fő belépési pontja.
-    Feldolgozza a parancssori argumentumokat, beállítja a környezetet,
-    kiválasztja és futtatja a megfelelő stratégiát.
+    Létrehozza a parancssori argumentumok feldolgozóját. Gyorsítótárazott: ismételt main() hívás
+    (pl. tesztkörnyezetből vagy könyvtárként használva) nem építi fel újra.
     """
-    # Parancssori argumentumok feldolgozójának létrehozása
     parser = argparse.ArgumentParser(
         description="Párhuzamos duplikátumkereső nagy szöveges fájlokban (Verzió 2.2 - Fájlon belüli és fájlok közötti duplikátumtörlés funkcióval).",
         formatter_class=argparse.RawTextHelpFormatter
@@ -1031,28 +1569,52 @@ def main():
         '-hd', '--hash-delimiter', type=str, default=';',
         help="A mezőket elválasztó karakter (alapértelmezett: ';')."
     )
+    parser.add_argument(
+        '-hb', '--hash-bits', type=int, choices=HASH_BITS_CHOICES, default=64,
+        help="A sor-hash kulcsok szélessége bitben (32 vagy 64, alapértelmezett: 64).\n"
+             "32 bittel a 'disk' mód rekordjai 4 bájttal rövidebbek, a memóriában tartott kulcsok\n"
+             "csak néhány százalékkal kisebbek. Az ütközések már néhány tízezer (kb. 2^16) egyedi\n"
+             "sor felett megjelennek, ezért csak kis adathalmazhoz ajánlott; a --deleteduplicates\n"
+             "mellett mindig 64 bites kulcsokat használunk."
+    )
     parser.add_argument(
         '-fp', '--file-pattern', type=str, default='*.csv',
         help="Fájl minta a bemeneti fájlok szűréséhez (pl. '*_2024_*.csv')."
     )
     parser.add_argument(
-        '-mbs', '--merge-batch-size', type=int, default=256,
-        help="Hány ideiglenes fájlt fésüljön össze egyszerre a 'disk' módban (alapértelmezett: 256)."
+        '-mbs', '--merge-batch-size', type=int, default=None,
+        help="Hány ideiglenes fájlt fésüljön össze egyszerre a 'disk' módban.\n"
+             "Alapértelmezés: több workerrel kb. a fájlszám négyzetgyöke (párhuzamos szintek), egyébként 256."
     )
     # ÚJ ARGUMENTUM: Duplikátumtörlés engedélyezése
     parser.add_argument(
         '-dd', '--deleteduplicates', type=str_to_bool, default=False,
         help="Duplikált sorok törlése a fájlokból (fájlon belüli és fájlok közötti) (true/false, alapértelmezett: false)."
     )
-    args = parser.parse_args()  # Argumentumok beolvasása
+    return parser
+
+def main():
+    """
+    A program fő belépési pontja.
+    Feldolgozza a parancssori argumentumokat, beállítja a környezetet,
+    kiválasztja és futtatja a megfelelő stratégiát.
+    """
+    args = _build_parser().parse_args()  # Argumentumok beolvasása
     config = vars(args)  # Argumentumok szótárrá alakítása a könnyebb átadhatóságért
 
     # Naplózás beállítása
     logger, file_only_logger = setup_logger()
 
-    start_time = time.time()  # Futási idő mérésének indítása
+    start_time = time.perf_counter()  # Futási idő mérésének indítása (monoton, nagy felbontású óra)
     logger.info(f"Program indítása {MAX_WORKERS} worker processzel.")
-    logger.info(f"Használt hash algoritmus: {HASH_ALGO_NAME}")
+    # A törlés csak a hash-t hasonlítja össze: 32 bites kulccsal egy ütközés egy különböző sort
+    # is törölne, ezért törléskor 64 bites kulcsokra váltunk (a config az args szótára)
+    if config.get('deleteduplicates', False) and args.hash_bits < DELETE_HASH_BITS:
+        logger.warning(f"A duplikátumtörléshez {DELETE_HASH_BITS} bites hash-kulcsokat használunk "
+                       f"a megadott {args.hash_bits} bit helyett (a 32 bites kulcsok ütközése "
+                       f"különböző sorokat is törölne).")
+        args.hash_bits = DELETE_HASH_BITS
+    logger.info(f"Használt hash algoritmus: {HASH_ALGO_NAME}, kulcsszélesség: {args.hash_bits} bit")
     logger.info(f"Konfiguráció: {config}")
     
     # Duplikátumtörlés figyelmeztetés
@@ -1066,46 +1628,49 @@ def main():
     if not files:
         return  # Ha nincsenek fájlok, a program leáll
 
-    # --- ÚJ: Kezdeti sorszám számítása ---
-    initial_total_lines = get_total_line_count(files, logger)
-    logger.info(f"A fájlok összesen {initial_total_lines:,} sort tartalmaznak a feldolgozás előtt.")
-    # --- VÉGE: Kezdeti sorszám számítása ---
-
-    # Fájlnevek és egyedi azonosítók összerendelése
-    id_to_file_map = {i: f.name for i, f in enumerate(files)}
-
-    # Stratégia kiválasztása
-    strategy = args.strategy
-    if strategy == 'auto':
-        strategy = auto_select_strategy(files, args.write_length, logger)
-
-    # A kiválasztott stratégiához tartozó függvény meghatározása
-    strategy_map = {
-        'fast': run_strategy_fast,
-        'safe': run_strategy_safe,
-        'disk': run_strategy_disk,
-    }
-
-    # A megfelelő stratégia futtatása
-    strategy_map[strategy](files, id_to_file_map, config, logger, file_only_logger)
-
-    # gc.collect() # Opcionális szemétgyűjtés a végén
-    end_time = time.time()  # Futási idő mérésének leállítása
+    # Egyetlen process pool a teljes futásra: a workerek egyszer indulnak el (és egyszer kapják meg
+    # a beállításokat), nem minden fázisban és stratégiában újra
+    with create_worker_pool(config) as executor:
+        # --- ÚJ: Kezdeti sorszám számítása ---
+        initial_total_lines = get_total_line_count(files, logger, executor)
+        logger.info(f"A fájlok összesen {initial_total_lines:,} sort tartalmaznak a feldolgozás előtt.")
+        # --- VÉGE: Kezdeti sorszám számítása ---
+
+        # Fájlnevek és egyedi azonosítók összerendelése
+        file_names = [f.name for f in files]  # Fájl ID -> fájlnév (az ID-k a 0..N-1 indexek)
+
+        # Stratégia kiválasztása
+        strategy = args.strategy
+        if strategy == 'auto':
+            strategy = auto_select_strategy(files, args.write_length, logger, args.hash_bits)
+
+        # A kiválasztott stratégiához tartozó függvény meghatározása
+        strategy_map = {
+            'fast': run_strategy_fast,
+            'safe': run_strategy_safe,
+            'disk': run_strategy_disk,
+        }
+
+        # A megfelelő stratégia futtatása
+        strategy_map[strategy](files, file_names, config, logger, file_only_logger, executor)
+
+        # gc.collect() # Opcionális szemétgyűjtés a végén
+        end_time = time.perf_counter()  # Futási idő mérésének leállítása
     
-    # --- ÚJ: Végső statisztikák kiírása ---
-    logger.info("=" * 50)
-    logger.info("--- VÉGSŐ ÖSSZEGZÉS ---")
-    logger.info(f"A futás befejeződött. Teljes idő: {end_time - start_time:.2f} másodperc.")
-    logger.info(f"Feldolgozás előtti teljes sorszám: {initial_total_lines:,}")
+        # --- ÚJ: Végső statisztikák kiírása ---
+        logger.info("=" * 50)
+        logger.info("--- VÉGSŐ ÖSSZEGZÉS ---")
+        logger.info(f"A futás befejeződött. Teljes idő: {end_time - start_time:.3f} másodperc.")
+        logger.info(f"Feldolgozás előtti teljes sorszám: {initial_total_lines:,}")
 
-    if config.get('deleteduplicates', False):
-        final_total_lines = get_total_line_count(files, logger)
-        deleted_lines = initial_total_lines - final_total_lines
-        logger.info(f"Feldolgozás utáni teljes sorszám: {final_total_lines:,}")
-        logger.info(f"Összesen törölt sorok száma: {deleted_lines:,}")
+        if config.get('deleteduplicates', False):
+            final_total_lines = get_total_line_count(files, logger, executor)
+            deleted_lines = initial_total_lines - final_total_lines
+            logger.info(f"Feldolgozás utáni teljes sorszám: {final_total_lines:,}")
+            logger.info(f"Összesen törölt sorok száma: {deleted_lines:,}")
     
-    logger.info("=" * 50)
-    # --- VÉGE: Végső statisztikák kiírása ---
+        logger.info("=" * 50)
+        # --- VÉGE: Végső statisztikák kiírása ---
 
 
 # A szkript belépési pontja, ha közvetlenül futtatják
@@ -1113,7 +1678,12 @@ if __name__ == '__main__':
     # Windows-specifikus beállítás a helyes karakterkódolásért a konzolon
     if sys.platform.startswith('win'):
         try:
-            os.system('chcp 65001 > nul')  # UTF-8 kódlap beállítása
+            # UTF-8 kódlap beállítása közvetlen Win32 hívással ('chcp' alfolyamat indítása nélkül)
+            import ctypes
+            ctypes.windll.kernel32.SetConsoleOutputCP(65001)
+            ctypes.windll.kernel32.SetConsoleCP(65001)
         except Exception:
             pass
+    # Lefordított (pl. Nuitka) futtatható állomány esetén a worker processzek helyes indításához
+    multiprocessing.freeze_support()
     main()  # A fő függvény meghívása
\ No newline at end of file
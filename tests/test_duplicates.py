@@ -0,0 +1,152 @@
+"""
+Regressziós tesztek a duplicates.py-hoz.
+Futtatás a repó gyökeréből: python -m unittest discover -s tests
+"""
+import os
+import sys
+import subprocess
+import tempfile
+import unittest
+import importlib.util
+from pathlib import Path
+from unittest import mock
+
+SCRIPT = Path(__file__).resolve().parent.parent / "duplicates.py"
+
+
+def load_module():
+    """Betölti a duplicates.py-t modulként (a worker processzek miatt a szokásos néven)."""
+    spec = importlib.util.spec_from_file_location("duplicates", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["duplicates"] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+duplicates = load_module()
+
+
+def run_script(work_dir: Path, *args: str, workers: int = 4) -> subprocess.CompletedProcess:
+    """Lefuttatja a szkriptet a work_dir könyvtárban, rögzített workerszámmal."""
+    env = dict(os.environ, DUPLICATE_FINDER_WORKERS=str(workers))
+    return subprocess.run([sys.executable, str(SCRIPT), *args], cwd=work_dir, env=env,
+                          capture_output=True, text=True, timeout=300)
+
+
+class MergeBatchSizeTest(unittest.TestCase):
+    def test_no_temp_files_with_several_workers(self):
+        # Üres 1. fázis (pl. csak fejléces bemenet) esetén sem szabad kivételt dobnia
+        with mock.patch.object(duplicates, "MAX_WORKERS", 4):
+            for file_count in (0, 1, 2):
+                self.assertGreaterEqual(duplicates.get_merge_batch_size(file_count, {}), 2)
+
+    def test_explicit_batch_size_wins(self):
+        self.assertEqual(duplicates.get_merge_batch_size(0, {'merge_batch_size': 7}), 7)
+
+
+class CountSetBitsTest(unittest.TestCase):
+    def test_matches_whole_bitmap_popcount(self):
+        bitmap = bytes(range(256)) * 5 + b"\xff\x01"
+        expected = bin(int.from_bytes(bitmap, 'little')).count('1')
+        for block_size in (1, 7, 1024 * 1024):
+            self.assertEqual(duplicates.count_set_bits(bitmap, block_size), expected)
+
+    def test_empty_bitmap(self):
+        self.assertEqual(duplicates.count_set_bits(bytearray(64)), 0)
+
+
+class MapTasksTest(unittest.TestCase):
+    def test_every_index_reported_once_with_its_own_result(self):
+        args = [(str(i),) if i != 5 else ("x",) for i in range(41)]
+        with mock.patch.object(duplicates, "MAX_WORKERS", 3), duplicates.create_worker_pool({}) as executor:
+            results = {index: (result, error) for index, result, error in duplicates.map_tasks(executor, int, args)}
+        self.assertEqual(sorted(results), list(range(41)))
+        for index, (result, error) in results.items():
+            if index == 5:
+                self.assertIsNone(result)
+                self.assertIn("ValueError", error)
+            else:
+                self.assertEqual((result, error), (index, None))
+
+
+class MemoryPressureTest(unittest.TestCase):
+    def test_warns_without_collecting_garbage(self):
+        fake_psutil = mock.Mock()
+        fake_psutil.virtual_memory.return_value.percent = 99.0
+        logger = mock.Mock()
+        with mock.patch.object(duplicates, "PSUTIL_AVAILABLE", True), \
+                mock.patch.object(duplicates, "psutil", fake_psutil, create=True), \
+                mock.patch("gc.collect") as collect:
+            self.assertTrue(duplicates.check_memory_pressure(logger))
+        collect.assert_not_called()
+        logger.warning.assert_called_once()
+
+
+class ReadBlocksAheadTest(unittest.TestCase):
+    def test_error_does_not_block_after_consumer_stopped(self):
+        block_queue = duplicates.queue.Queue(maxsize=1)
+        block_queue.put(b"teli")
+        stop_event = duplicates.threading.Event()
+        stop_event.set()
+        reader = duplicates.threading.Thread(
+            target=duplicates._read_blocks_ahead,
+            args=(Path("nem_letezo_fajl.csv"), block_queue, stop_event), daemon=True)
+        reader.start()
+        reader.join(timeout=5)
+        self.assertFalse(reader.is_alive())
+
+
+class NormalizerTest(unittest.TestCase):
+    def test_matches_split_join(self):
+        lines = [b"a;b;c;d", b"a;b", b"", b";;;", b"x;y;z;"]
+        for delimiter in (b";", b"::"):
+            for count in (0, 1, 3):
+                normalize = duplicates.make_normalizer(delimiter, count)
+                for line in lines + [line.replace(b";", delimiter) for line in lines]:
+                    self.assertEqual(normalize(line), delimiter.join(line.split(delimiter, count)[:count]))
+
+
+@unittest.skipUnless(duplicates.HASH_ALGO_NAME.startswith("xxhash"), "az ütköző sorpár xxh32-re érvényes")
+class DeleteWithShortHashTest(unittest.TestCase):
+    def test_colliding_distinct_lines_are_kept(self):
+        # A két sor első 6 mezőjének xxh32 hash-e megegyezik, de a sorok különböznek
+        with tempfile.TemporaryDirectory() as tmp:
+            work_dir = Path(tmp)
+            (work_dir / "input").mkdir()
+            (work_dir / "input" / "a.csv").write_text("h\n25958;b;c;d;e;f;keepme\n", encoding="utf-8")
+            (work_dir / "input" / "b.csv").write_text("h\n113992;b;c;d;e;f;keepme\n", encoding="utf-8")
+            for strategy in ("fast", "safe", "disk"):
+                result = run_script(work_dir, "--strategy", strategy, "-hb", "32", "-dd", "true")
+                self.assertEqual(result.returncode, 0, result.stderr)
+                self.assertIn("113992;b;c;d;e;f;keepme", (work_dir / "input" / "b.csv").read_text(encoding="utf-8"))
+
+
+class DiskEmptyKeyTest(unittest.TestCase):
+    def test_empty_key_lines_are_not_inter_file_duplicates(self):
+        # A 'disk' mód kihagyja az üres normalizált kulcsú sorokat (';x' -hf 1 mellett)
+        with tempfile.TemporaryDirectory() as tmp:
+            work_dir = Path(tmp)
+            (work_dir / "input").mkdir()
+            (work_dir / "input" / "a.csv").write_text("h\n;x\n", encoding="utf-8")
+            (work_dir / "input" / "b.csv").write_text("h\n;y\n", encoding="utf-8")
+            result = run_script(work_dir, "--strategy", "disk", "-hf", "1", "-dd", "true")
+            self.assertEqual(result.returncode, 0, result.stderr)
+            self.assertIn("Nem található duplikátum.", (work_dir / "duplicates.txt").read_text(encoding="utf-8"))
+            self.assertEqual((work_dir / "input" / "b.csv").read_text(encoding="utf-8"), "h\n;y\n")
+
+
+class HeaderOnlyInputTest(unittest.TestCase):
+    def test_disk_strategy_with_header_only_files(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            work_dir = Path(tmp)
+            (work_dir / "input").mkdir()
+            for name in ("a.csv", "b.csv"):
+                (work_dir / "input" / name).write_text("h1;h2;h3\n", encoding="utf-8")
+            result = run_script(work_dir, "--strategy", "disk")
+            self.assertEqual(result.returncode, 0, result.stderr)
+            output = (work_dir / "duplicates.txt").read_text(encoding="utf-8")
+            self.assertIn("Nem található duplikátum.", output)
+
+
+if __name__ == "__main__":
+    unittest.main()